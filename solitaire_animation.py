@@ -0,0 +1,219 @@
+from argparse import ArgumentParser
+from collections import deque
+from random import Random
+from time import perf_counter
+
+import turtle_solitaire_game as game
+
+# Animating cards.
+#
+# Without animation the cards are either drawn step by step with the
+# tracer on, or all at once with it off. An AnimationScheduler instead runs
+# frames from turtle's ontimer at a target frame rate, so the window keeps
+# handling clicks and keys between frames. Each frame
+#   - does any work that has fallen due (such as drawing the next card of
+#     an animated deal), as long as there is time left in the frame for it;
+#     the rest waits for the next frame
+#   - moves each moving card (all the items with its tag, see Tagged cards)
+#     straight to where it should be at that moment, with one canvas move,
+#     so only the moving cards' items are touched
+#   - paints the screen once, with update
+# Card positions are worked out from the clock rather than counted in
+# frames, so if a frame runs late the next one catches up in a single
+# step: the moves that would have been made in between are coalesced into
+# one. Moving a card that is already moving takes it on from where it is.
+#
+#   scheduler = AnimationScheduler(fps = 60)
+#   deal_animated(scheduler, full_game)
+#   done()
+#
+# On the headless backend the scheduler follows the headless canvas's
+# simulated clock, and the frames run when run_timers (or done) is called.
+
+default_fps = 60
+work_share = 0.5 # fraction of each frame that due work may use
+deck_position = (game.half_width - game.card_width, -game.half_height + game.card_height)
+default_card_interval = 0.06 # seconds between cards when dealing
+default_move_seconds = 0.35 # seconds for a card to reach its place
+
+
+# Ease in and out, from 0 at the start to 1 at the end
+def smoothstep(fraction):
+    return fraction * fraction * (3 - 2 * fraction)
+
+
+class CardMove:
+    def __init__(self, tag, x_distance, y_distance, start, seconds, when_done = None):
+        self.tag = tag
+        self.x_distance = x_distance
+        self.y_distance = y_distance
+        self.start = start
+        self.seconds = seconds
+        self.when_done = when_done
+        self.x_moved = self.y_moved = 0 # so far
+
+    # Move the card to where it should be at time now; returns True when
+    # it has arrived
+    def step(self, now):
+        fraction = 1 if self.seconds <= 0 else min(1, (now - self.start) / self.seconds)
+        eased = smoothstep(fraction)
+        x_step = self.x_distance * eased - self.x_moved
+        y_step = self.y_distance * eased - self.y_moved
+        if x_step or y_step:
+            game.move_cards(self.tag, x_step, y_step)
+            self.x_moved += x_step
+            self.y_moved += y_step
+        return fraction >= 1
+
+
+class AnimationScheduler:
+    def __init__(self, fps = default_fps, clock = None):
+        self.frame_seconds = 1 / fps
+        self.clock = clock or default_clock()
+        self.moves = {} # card tag -> CardMove
+        self.work = deque() # (due time, function), in due order
+        self.running = False
+        self.when_idle = None # called whenever the last move and work are done
+        # Statistics: frames run, frames whose work took longer than a
+        # frame, and the longest frame's work in seconds
+        self.frames = 0
+        self.late_frames = 0
+        self.longest_frame = 0
+
+    # Call function (with no arguments) in the first frame at or after
+    # seconds from now
+    def schedule(self, function, seconds = 0):
+        due = self.clock() + seconds
+        if self.work and due < self.work[-1][0]:
+            self.work = deque(sorted(list(self.work) + [(due, function)], key = lambda entry: entry[0]))
+        else:
+            self.work.append((due, function))
+        self.start()
+
+    # Move the card items with a tag by the given distances (in turtle
+    # coordinates) over seconds, then call when_done, if given
+    def move(self, tag, x_distance, y_distance, seconds = default_move_seconds, when_done = None):
+        now = self.clock()
+        moving = self.moves.get(tag)
+        if moving is not None:
+            # Carry on from where the card has got to
+            x_distance += moving.x_distance - moving.x_moved
+            y_distance += moving.y_distance - moving.y_moved
+        self.moves[tag] = CardMove(tag, x_distance, y_distance, now, seconds, when_done)
+        self.start()
+
+    def busy(self):
+        return bool(self.moves or self.work)
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            game.getscreen().ontimer(self.frame, 0)
+
+    def frame(self):
+        frame_start = perf_counter()
+        now = self.clock()
+        while self.work and self.work[0][0] <= now:
+            if perf_counter() - frame_start > self.frame_seconds * work_share:
+                break
+            due, function = self.work.popleft()
+            function()
+        for tag, moving in list(self.moves.items()):
+            if moving.step(now):
+                del self.moves[tag]
+                if moving.when_done is not None:
+                    moving.when_done()
+        game.update()
+
+        frame_work = perf_counter() - frame_start
+        self.frames += 1
+        self.longest_frame = max(self.longest_frame, frame_work)
+        if frame_work > self.frame_seconds:
+            self.late_frames += 1
+        if self.busy():
+            delay = max(0, self.frame_seconds - frame_work)
+            game.getscreen().ontimer(self.frame, int(delay * 1000))
+        else:
+            self.running = False
+            if self.when_idle is not None:
+                self.when_idle()
+
+
+# The scheduler's clock for the current backend, in seconds
+def default_clock():
+    if game.active_backend == 'headless':
+        canvas = game.getscreen().cv
+        return lambda: canvas.clock / 1000
+    return perf_counter
+
+
+# Deal a game one card at a time, each card flying from the deck to its
+# place. Returns the game's render plan. The cards are drawn whole (not
+# culled), as each one is seen on its own while it flies.
+def deal_animated(scheduler, cards, card_interval = default_card_interval,
+                  move_seconds = default_move_seconds, deck = deck_position):
+    saved_setting = game.cull_hidden_cards
+    game.cull_hidden_cards = False
+    try:
+        plan = game.plan_deal(cards)
+    finally:
+        game.cull_hidden_cards = saved_setting
+    detail = game.choose_detail_level(plan)
+
+    def deal_card(placement):
+        tag = game.placement_tags(placement)[-1]
+        game.draw_plan([placement], detail)
+        canvas = game.getscreen().cv
+        placed = [(item, canvas.coords(item)) for item in canvas.find_withtag(tag)]
+
+        # Put the items back exactly where they were drawn, rather than
+        # where adding up the moves' distances leaves them
+        def settle():
+            for item, coordinates in placed:
+                canvas.coords(item, *coordinates)
+
+        x_distance, y_distance = placement.x - deck[0], placement.y - deck[1]
+        game.move_cards(tag, -x_distance, -y_distance)
+        scheduler.move(tag, x_distance, y_distance, move_seconds, settle)
+
+    for number, placement in enumerate(plan):
+        scheduler.schedule(lambda placement = placement: deal_card(placement),
+                           number * card_interval)
+    return plan
+
+
+def main(arguments = None):
+    parser = ArgumentParser(description = 'Deal a full game with animation and report the frame rate.')
+    parser.add_argument('--fps', type = int, default = default_fps,
+                        help = 'target frames per second (default 60)')
+    parser.add_argument('--headless', action = 'store_true',
+                        help = 'animate on the headless canvas with its simulated clock')
+    parser.add_argument('--seed', type = int, default = 2024,
+                        help = 'seed for the full game (default 2024)')
+    options = parser.parse_args(arguments)
+
+    if options.headless:
+        game.use_backend('headless')
+    game.create_drawing_canvas(False)
+    game.tracer(False)
+    game.title('Dealing')
+    # Compile the sprites first, so the first cards aren't slowed by it
+    for artwork in list(game.suit_registry.values()) + [game.joker_artwork]:
+        game.compile_sprite(artwork)
+    scheduler = AnimationScheduler(options.fps)
+    start_clock = scheduler.clock()
+
+    def report():
+        seconds = max(scheduler.clock() - start_clock, 1e-9)
+        print('%d frames in %.2f s (%.1f frames/s, target %d), %d late, longest frame %.1f ms' %
+              (scheduler.frames, seconds, scheduler.frames / seconds, options.fps,
+               scheduler.late_frames, scheduler.longest_frame * 1000))
+
+    scheduler.when_idle = report
+    deal_animated(scheduler, game.make_full_game(Random(options.seed)))
+    game.done()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
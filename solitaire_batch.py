@@ -0,0 +1,149 @@
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count, makedirs
+from os.path import join
+from random import Random
+from time import perf_counter
+
+import turtle_solitaire_game as game
+from solitaire_cache import RenderCache, default_max_bytes, render_cached
+from solitaire_deals import load_games
+
+# Rendering many deals to image files.
+#
+# The drawing code has one turtle and one screen per process, so deals are
+# rendered in a pool of worker processes. Each worker sets up its own
+# headless table once and then, for every deal it is given, clears the
+# cards, deals the new ones and saves the table as an image. The deals come
+# from a file written by solitaire_deals.py (one image per game, numbered
+# from 0) or are random_game's games for a range of seeds (one image per
+# seed). With a render cache (see solitaire_cache.py), deals rendered
+# before are copied from the cache instead of being drawn again.
+#
+#   python solitaire_batch.py --deals deals.bin --output images
+#   python solitaire_batch.py --seeds 0:1000 --output images --format svg
+#   python solitaire_batch.py --seeds 0:1000 --cache render_cache
+
+default_chunk_size = 20 # deals sent to a worker at a time
+artwork_seed = 0 # seed for the random seed positions on the cards
+
+# This worker's settings
+worker_show_axes = False
+worker_cache = None
+
+
+# Set up a worker's table
+def start_worker(show_axes = False, cache_directory = None, cache_bytes = default_max_bytes):
+    global worker_show_axes, worker_cache
+    worker_show_axes = show_axes
+    if cache_directory:
+        worker_cache = RenderCache(cache_directory, cache_bytes)
+    game.use_backend('headless')
+    game.create_drawing_canvas(show_axes)
+    game.tracer(False)
+    game.artwork_random.seed(artwork_seed)
+
+
+# Render a list of (image filename, game) jobs on this worker's table,
+# returning how many images were made and how many came from the cache
+def render_deals(jobs):
+    cache_hits = 0
+    for filename, cards in jobs:
+        if worker_cache is not None:
+            cache_hits += render_cached(cards, filename, worker_cache, worker_show_axes)
+        else:
+            game.new_deal(cards)
+            game.save_drawing(filename)
+    return len(jobs), cache_hits
+
+
+# (image filename, packed game) jobs for every game in a file
+def file_jobs(deals_filename, output, image_format):
+    for number, cards in enumerate(load_games(deals_filename)):
+        yield join(output, 'deal_%06d.%s' % (number, image_format)), game.pack_game(cards)
+
+
+# (image filename, packed game) jobs for random_game's game for each seed
+def seed_jobs(first_seed, last_seed, output, image_format):
+    for seed in range(first_seed, last_seed):
+        cards = game.random_game(False, Random(seed))
+        yield join(output, 'seed_%d.%s' % (seed, image_format)), game.pack_game(cards)
+
+
+# Split jobs into lists of chunk_size
+def chunked(jobs, chunk_size):
+    chunk = []
+    for job in jobs:
+        chunk.append(job)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Render every job, over workers processes. Returns the number of images
+# and how many of them came from the cache.
+def render_batch(jobs, workers = None, chunk_size = default_chunk_size, show_axes = False,
+                 cache_directory = None, cache_bytes = default_max_bytes):
+    workers = workers or cpu_count() or 1
+    chunks = chunked(jobs, chunk_size)
+    worker_settings = (show_axes, cache_directory, cache_bytes)
+    if workers == 1:
+        start_worker(*worker_settings)
+        results = [render_deals(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(workers, initializer = start_worker,
+                                 initargs = worker_settings) as executor:
+            results = list(executor.map(render_deals, chunks))
+    return (sum(rendered for rendered, cache_hits in results),
+            sum(cache_hits for rendered, cache_hits in results))
+
+
+def parse_seed_range(seeds):
+    first_seed, separator, last_seed = seeds.partition(':')
+    if not separator:
+        raise ValueError('seed range should be START:END, e.g. 0:1000')
+    return int(first_seed), int(last_seed)
+
+
+def main(arguments = None):
+    parser = ArgumentParser(description = 'Render deals to image files in parallel.')
+    source = parser.add_mutually_exclusive_group(required = True)
+    source.add_argument('--deals', help = 'file of games written by solitaire_deals.py')
+    source.add_argument('--seeds', help = "range of seeds for random_game, e.g. '0:1000'")
+    parser.add_argument('--output', default = 'images', help = 'directory for the images')
+    parser.add_argument('--format', default = 'png', choices = ['png', 'ppm', 'svg'],
+                        help = 'image format (default png)')
+    parser.add_argument('--workers', type = int,
+                        help = 'worker processes (default one per core)')
+    parser.add_argument('--chunk-size', type = int, default = default_chunk_size,
+                        help = 'deals sent to a worker at a time (default 20)')
+    parser.add_argument('--axes', action = 'store_true',
+                        help = 'draw the coordinates and stack locations')
+    parser.add_argument('--cache', help = 'directory of the render cache (default no cache)')
+    parser.add_argument('--cache-size', type = float, default = default_max_bytes / 1024 / 1024,
+                        help = 'largest size of the render cache in MiB (default 500)')
+    options = parser.parse_args(arguments)
+
+    makedirs(options.output, exist_ok = True)
+    if options.deals:
+        jobs = file_jobs(options.deals, options.output, options.format)
+    else:
+        first_seed, last_seed = parse_seed_range(options.seeds)
+        jobs = seed_jobs(first_seed, last_seed, options.output, options.format)
+
+    workers = options.workers or cpu_count() or 1
+    start = perf_counter()
+    rendered, cache_hits = render_batch(jobs, workers, options.chunk_size, options.axes,
+                                        options.cache, int(options.cache_size * 1024 * 1024))
+    seconds = perf_counter() - start
+    print('%d images in %.2f s with %d workers (%.1f images/s)' %
+          (rendered, seconds, workers, rendered / max(seconds, 1e-9)))
+    if options.cache:
+        print('%d from the render cache' % cache_hits)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
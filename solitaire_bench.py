@@ -0,0 +1,202 @@
+from argparse import ArgumentParser
+from json import dump, load
+from os.path import dirname, join
+from random import Random
+from time import perf_counter
+import gc
+import tracemalloc
+
+import turtle_solitaire_game as game
+from solitaire_profile import DrawingProfiler
+
+# Benchmarks for dealing cards.
+#
+# Deals each of the fixed_game_0 ... fixed_game_17 datasets and a full game
+# (built from a fixed seed, so every run deals the same cards) and records,
+# for each dataset:
+#   seconds    - best wall time of deal_cards over several runs
+#   primitives - how many turtle functions the deal called
+#   items      - how many canvas items the deal created
+#   peak_bytes - peak memory allocated while dealing
+# Results can be saved as a baseline and later runs compared against it.
+# Before benchmarking, check_card_identifiers checks that every card is
+# drawn with the right card numbers/ids.
+#
+#   python solitaire_bench.py                 # run and print the results
+#   python solitaire_bench.py --save          # ... and store them as the baseline
+#   python solitaire_bench.py --compare       # ... and check for regressions
+
+default_baseline = join(dirname(__file__), 'bench_baseline.json')
+full_game_seed = 2024 # seed for the benchmark's full game
+artwork_seed = 0 # seed for the random seed positions on the cards
+
+# Allowed growth over the baseline before a result counts as a regression
+default_time_tolerance = 0.3
+default_count_tolerance = 0.05
+# Timing changes smaller than this (in seconds) are just noise
+min_time_change = 0.002
+
+
+# The datasets to benchmark, in order
+def datasets():
+    games = [('fixed_game_' + str(number), getattr(game, 'fixed_game_' + str(number)))
+             for number in range(18)]
+    games.append(('full_game', game.make_full_game(Random(full_game_seed))))
+    return games
+
+
+# Get a canvas ready to deal on. On the headless backend every run gets a
+# new canvas; in the Tk window the screen is cleared instead.
+def fresh_canvas(backend):
+    if backend == 'headless':
+        game.use_backend('headless')
+    else:
+        game.getscreen().clear()
+        game.hideturtle()
+    game.tracer(False)
+    game.penup()
+    game.artwork_random.seed(artwork_seed)
+    # Don't let the previous run's garbage be collected during this one
+    gc.collect()
+    return game.getscreen().cv
+
+
+# Deal a game on a fresh canvas, returning the time taken and the number
+# of canvas items created
+def timed_deal(cards, backend):
+    canvas = fresh_canvas(backend)
+    items_before = len(canvas.find_all())
+    start = perf_counter()
+    game.deal_cards(cards)
+    game.update()
+    seconds = perf_counter() - start
+    return seconds, len(canvas.find_all()) - items_before
+
+
+# Deal a game counting every turtle function called, by name
+def count_primitives(cards, backend):
+    fresh_canvas(backend)
+    with DrawingProfiler(include_canvas = False) as profiler:
+        game.deal_cards(cards)
+    return profiler.primitive_counts()
+
+
+# Deal a game tracing memory allocations, returning the peak in bytes
+def peak_memory(cards, backend):
+    fresh_canvas(backend)
+    tracemalloc.start()
+    try:
+        game.deal_cards(cards)
+        game.update()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+# Benchmark one dataset
+def benchmark(cards, backend = 'headless', repeats = 5):
+    # Untimed first deal, so one-off work such as compiling sprites
+    # doesn't count against the first dataset
+    timed_deal(cards, backend)
+    runs = [timed_deal(cards, backend) for repeat in range(repeats)]
+    primitives = count_primitives(cards, backend)
+    return {'seconds': min(seconds for seconds, items in runs),
+            'primitives': sum(primitives.values()),
+            'primitive_counts': dict(sorted(primitives.items())),
+            'items': runs[-1][1],
+            'peak_bytes': peak_memory(cards, backend)}
+
+
+# Benchmark every dataset, returning {dataset name: results}
+def run_benchmarks(backend = 'headless', repeats = 5, names = None):
+    game.use_backend(backend)
+    results = {}
+    for name, cards in datasets():
+        if names is None or name in names:
+            results[name] = benchmark(cards, backend, repeats)
+    return results
+
+
+# Compare results with a baseline. Returns a list of regressions, each a
+# (dataset, metric, baseline value, new value) tuple.
+def compare(results, baseline, time_tolerance = default_time_tolerance,
+            count_tolerance = default_count_tolerance):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric, tolerance in [('seconds', time_tolerance), ('primitives', count_tolerance),
+                                  ('items', count_tolerance), ('peak_bytes', count_tolerance)]:
+            old_value = baseline[name][metric]
+            if metric == 'seconds' and result[metric] - old_value < min_time_change:
+                continue
+            if result[metric] > old_value * (1 + tolerance):
+                regressions.append((name, metric, old_value, result[metric]))
+    return regressions
+
+
+def print_results(results, baseline = None):
+    print('%-14s %10s %8s %11s %8s %12s' % ('dataset', 'ms', 'vs base', 'primitives',
+                                           'items', 'peak KiB'))
+    for name, result in results.items():
+        if baseline and name in baseline and baseline[name]['seconds'] > 0:
+            change = '%+7.0f%%' % ((result['seconds'] / baseline[name]['seconds'] - 1) * 100)
+        else:
+            change = '       -'
+        print('%-14s %10.2f %s %11d %8d %12.1f' % (name, result['seconds'] * 1000, change,
+                                                   result['primitives'], result['items'],
+                                                   result['peak_bytes'] / 1024))
+
+
+def main(arguments = None):
+    parser = ArgumentParser(description = 'Benchmark dealing the solitaire datasets.')
+    parser.add_argument('--backend', choices = ['headless', 'tk'], default = 'headless',
+                        help = 'draw headless (default) or in a Tk window with the tracer off')
+    parser.add_argument('--repeats', type = int, default = 5,
+                        help = 'timed deals per dataset (default 5)')
+    parser.add_argument('--dataset', action = 'append',
+                        help = 'only benchmark this dataset (can be repeated)')
+    parser.add_argument('--baseline', default = default_baseline,
+                        help = 'baseline file (default bench_baseline.json)')
+    parser.add_argument('--save', action = 'store_true',
+                        help = 'store the results as the new baseline')
+    parser.add_argument('--compare', action = 'store_true',
+                        help = 'fail if the results regress from the baseline')
+    parser.add_argument('--time-tolerance', type = float, default = default_time_tolerance,
+                        help = 'allowed fractional slowdown (default 0.3)')
+    parser.add_argument('--output', help = 'also write the results to this JSON file')
+    options = parser.parse_args(arguments)
+
+    game.use_backend(options.backend)
+    try:
+        game.check_card_identifiers()
+    except AssertionError as error:
+        print('CARD IDENTIFIER CHECK FAILED: ' + str(error))
+        return 1
+    results = run_benchmarks(options.backend, options.repeats, options.dataset)
+    baseline = None
+    if options.compare:
+        with open(options.baseline) as baseline_file:
+            baseline = load(baseline_file)
+    print_results(results, baseline)
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            dump(results, output_file, indent = 1)
+    if options.save:
+        with open(options.baseline, 'w') as baseline_file:
+            dump(results, baseline_file, indent = 1)
+        print('Saved baseline to ' + options.baseline)
+    if options.compare:
+        regressions = compare(results, baseline, options.time_tolerance)
+        for name, metric, old_value, new_value in regressions:
+            print('REGRESSION %s %s: %s -> %s' % (name, metric, old_value, new_value))
+        if regressions:
+            return 1
+        print('No regressions against ' + options.baseline)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+from hashlib import sha256
+from os import getpid, makedirs, remove, replace, scandir, utime
+from os.path import getsize, join, splitext
+from shutil import copyfile
+
+import turtle_solitaire_game as game
+
+# On-disk cache of rendered deals.
+#
+# A rendered deal is stored under a hash of everything that decides what it
+# looks like: the game itself (packed, so ['Stack 1', 'Suit A', 1, 0] and
+# the same stack as a StackDeal hash alike), the card size, whether the
+# axes are shown, the artwork version, whether seeds are merged, the
+# circle quality, the level of detail thresholds, whether covered cards
+# are culled, whether sprites are used and the image format. Rendering a deal that is already in
+# the cache is then just a copy of the stored image.
+#
+# Each hit touches the stored file, so the files' modification times
+# record when they were last used. When the cache grows past max_bytes the
+# least recently used images are deleted until it fits again.
+#
+# Only sprites give every card the same seeds each time it is drawn, so
+# with use_sprite_cache off deals are always drawn and never cached.
+#
+#   cache = RenderCache('render_cache')
+#   render_cached(fixed_game_13, 'deal.png', cache)
+
+default_max_bytes = 500 * 1024 * 1024
+
+
+# Hash of a deal and everything else that changes its image
+def deal_key(cards, show_axes = False, image_format = 'png'):
+    digest = sha256(game.pack_game(cards))
+    digest.update(repr((game.size, bool(show_axes), game.artwork_version,
+                        game.merge_seeds, game.circle_quality, game.lod_min_size,
+                        game.lod_card_budget, game.cull_hidden_cards, game.use_sprite_cache,
+                        image_format.lower())).encode())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    def __init__(self, directory, max_bytes = default_max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        makedirs(directory, exist_ok = True)
+        self.total_bytes = sum(size for path, size, used in self.entries())
+
+    # Where the image for a key is stored
+    def path(self, key, image_format):
+        return join(self.directory, key[:2], key + '.' + image_format)
+
+    # (path, size, last used) of every stored image
+    def entries(self):
+        for subdirectory in scandir(self.directory):
+            if subdirectory.is_dir():
+                for entry in scandir(subdirectory.path):
+                    if entry.is_file() and not entry.name.endswith('.tmp'):
+                        status = entry.stat()
+                        yield entry.path, status.st_size, status.st_mtime
+
+    # Copy the stored image for a key to filename. Returns False if the key
+    # isn't in the cache.
+    def get(self, key, filename):
+        path = self.path(key, splitext(filename)[1][1:])
+        try:
+            copyfile(path, filename)
+        except FileNotFoundError:
+            return False
+        try:
+            utime(path)
+        except FileNotFoundError:
+            pass # evicted by another process after we copied it
+        return True
+
+    # Store the image in filename under a key
+    def put(self, key, filename):
+        path = self.path(key, splitext(filename)[1][1:])
+        makedirs(join(self.directory, key[:2]), exist_ok = True)
+        # Copy then rename, so other processes never see half an image
+        temporary = path + '.' + str(getpid()) + '.tmp'
+        copyfile(filename, temporary)
+        replace(temporary, path)
+        self.total_bytes += getsize(path)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    # Delete the least recently used images until the cache fits in
+    # max_bytes
+    def evict(self):
+        entries = sorted(self.entries(), key = lambda entry: entry[2])
+        self.total_bytes = sum(size for path, size, used in entries)
+        for path, size, used in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                remove(path)
+            except FileNotFoundError:
+                pass
+            self.total_bytes -= size
+
+
+# Render a deal to filename (on a table already set up by
+# create_drawing_canvas) unless it is in the cache. Returns True if the
+# image came from the cache.
+def render_cached(cards, filename, cache, show_axes = False):
+    if not game.use_sprite_cache:
+        # The seeds would come out differently every time
+        game.new_deal(cards)
+        game.save_drawing(filename)
+        return False
+    key = deal_key(cards, show_axes, splitext(filename)[1][1:])
+    if cache.get(key, filename):
+        return True
+    game.new_deal(cards)
+    game.save_drawing(filename)
+    cache.put(key, filename)
+    return False
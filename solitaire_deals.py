@@ -0,0 +1,157 @@
+from argparse import ArgumentParser
+from itertools import permutations
+from json import dumps, loads
+from random import Random
+from time import perf_counter
+
+import turtle_solitaire_game as game
+
+# Generating random games in bulk.
+#
+# generate_packed(count, seed) makes count random games with the same
+# distribution as random_game: the stacks in random order, a random suit
+# (one of the num_random_suits that random_game deals) and number of cards
+# for each, a non-zero extra value extra_probability percent of the time,
+# and empty stacks left out three times in four.
+# Rather than calling shuffle, choice and randint for every stack, each
+# choice is made from one call of random() and the stack order is picked
+# from a table of every possible order, and the games come out packed (see
+# pack_game) without building random_game's name lists. The same seed
+# always gives the same games (though not the games random_game would
+# give with that seed). generate_games gives them as lists instead.
+#
+# Games can be streamed to and from a file either as JSON lines, one
+# stack specification list per line, or in a binary file of packed games.
+#
+#   python solitaire_deals.py 1000000 --seed 1 --output deals.bin
+#   python solitaire_deals.py 1000 --seed 1 --output deals.jsonl
+
+binary_magic = b'SOLDEALS' # start of a binary file of games
+binary_extensions = ('.bin', '.deals')
+
+
+# Generate count packed games from a seed
+def generate_packed(count, seed = None):
+    random = Random(seed).random
+    orders = list(permutations(range(game.num_stacks)))
+    num_orders = len(orders)
+    # The suits random_game deals, as suit indices
+    suits = [game.suit_indices['Suit ' + chr(ord('A') + suit_num)]
+             for suit_num in range(game.num_random_suits)]
+    num_suits = len(suits)
+    num_counts = game.max_cards + 1
+    extra_chance = game.extra_probability / 100
+    # Packed stacks, by stack, suit, number of cards and extra value
+    stacks = [[[[bytes((stack, suits[suit], num_cards, option)) for option in range(num_cards + 1)]
+                for num_cards in range(num_counts)]
+               for suit in range(num_suits)]
+              for stack in range(game.num_stacks)]
+    for number in range(count):
+        packed = []
+        for stack in orders[int(random() * num_orders)]:
+            suit = int(random() * num_suits)
+            num_cards = int(random() * num_counts)
+            if num_cards > 0 and random() < extra_chance:
+                option = 1 + int(random() * num_cards)
+            else:
+                option = 0
+            # Empty stacks are left out three times in four
+            if num_cards != 0 or random() < 0.25:
+                packed.append(stacks[stack][suit][num_cards][option])
+        yield b''.join(packed)
+
+
+# Generate count games from a seed, as random_game's lists
+def generate_games(count, seed = None):
+    for packed in generate_packed(count, seed):
+        yield [deal.to_list() for deal in game.unpack_game(packed)]
+
+
+# JSON lines
+
+def write_jsonl(games, stream):
+    written = 0
+    for cards in games:
+        stream.write(dumps([deal.to_list() for deal in game.normalise_game(cards)]) + '\n')
+        written += 1
+    return written
+
+
+def read_jsonl(stream):
+    for line in stream:
+        if line.strip():
+            yield loads(line)
+
+
+# Binary files: binary_magic, then each packed game after one byte giving
+# its number of stacks
+
+def write_binary(games, stream):
+    stream.write(binary_magic)
+    written = 0
+    for cards in games:
+        packed = cards if isinstance(cards, bytes) else game.pack_game(cards)
+        stream.write(bytes((len(packed) // game.deal_size,)) + packed)
+        written += 1
+    return written
+
+
+# Read packed games back from a binary file
+def read_binary(stream):
+    if stream.read(len(binary_magic)) != binary_magic:
+        raise ValueError('not a file of packed games')
+    while True:
+        header = stream.read(1)
+        if not header:
+            return
+        packed = stream.read(header[0] * game.deal_size)
+        if len(packed) != header[0] * game.deal_size:
+            raise ValueError('file of packed games ends part way through a game')
+        yield packed
+
+
+def is_binary_file(filename):
+    return filename.endswith(binary_extensions)
+
+
+# Read games from a file written by save_games, in either format
+def load_games(filename):
+    if is_binary_file(filename):
+        with open(filename, 'rb') as stream:
+            yield from read_binary(stream)
+    else:
+        with open(filename) as stream:
+            yield from read_jsonl(stream)
+
+
+# Write games to a file, in binary if its name ends in .bin or .deals and as
+# JSON lines otherwise. Returns the number of games written.
+def save_games(games, filename):
+    if is_binary_file(filename):
+        with open(filename, 'wb') as stream:
+            return write_binary(games, stream)
+    with open(filename, 'w') as stream:
+        return write_jsonl(games, stream)
+
+
+def main(arguments = None):
+    parser = ArgumentParser(description = 'Generate random games in bulk.')
+    parser.add_argument('count', type = int, help = 'how many games to generate')
+    parser.add_argument('--seed', type = int, help = 'seed, to generate the same games again')
+    parser.add_argument('--output', help = 'write the games to this file '
+                        '(.bin or .deals for packed games, otherwise JSON lines)')
+    options = parser.parse_args(arguments)
+
+    start = perf_counter()
+    games = generate_packed(options.count, options.seed)
+    if options.output:
+        written = save_games(games, options.output)
+    else:
+        written = sum(1 for packed in games)
+    seconds = perf_counter() - start
+    print('%d games in %.2f s (%.0f games/s)' % (written, seconds, written / max(seconds, 1e-9)))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,250 @@
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter
+
+import turtle_solitaire_game as game
+
+# Playing a dealt game.
+#
+# The rules, built on deal_cards's stacks: each dealt stack holds count
+# cards of its suit, ranked 1 (at the back of the stack) up to count (on
+# top), with the joker on top of them if the stack has one. Only the top
+# card of a stack can move, and it can go
+#   - home, if its suit's home has reached the rank below it (every suit
+#     starts at 0, so rank 1 can always go home). Several stacks can deal
+#     the same suit, so a rank can go home more than once.
+#   - onto a card of a different suit one rank higher
+#   - onto an empty stack, unless it is the only card in its stack
+# The joker is wild: it can go home, or onto any stack, at any time, and
+# any card can go onto it. The game is won when every card is home.
+#
+# A game state is a tuple of ints, one per stack and then one for the
+# homes, so states are hashable, cheap to copy and compare, and make no
+# other objects. Each card is one byte: its suit index in the high four
+# bits and its rank in the low four, with joker_card for the joker. A
+# stack's int holds its cards a byte each, with the top card in the lowest
+# byte (0 for an empty stack). The homes' int holds each suit's highest
+# rank home in four bits, suit 0 lowest. A move is an int too: the source
+# stack in the high four bits and the destination (a stack, or home) in
+# the low four.
+#
+#   state = initial_state(fixed_game_13)
+#   for move in legal_moves(state):
+#       print(describe_move(state, move))
+#   state = apply_move(state, legal_moves(state)[0])
+#   show_state(state)
+
+joker_card = 0xFF
+home = 0xF # destination of a move that takes a card home
+
+if game.num_stacks >= home:
+    raise ValueError('the game engine can only play up to ' + str(home - 1) + ' stacks')
+
+
+def card_code(suit, rank):
+    if not 0 <= suit < 15 or not 1 <= rank < 15:
+        raise ValueError('card out of range: suit ' + repr(suit) + ', rank ' + repr(rank))
+    return suit << 4 | rank
+
+
+def card_suit(card):
+    return card >> 4
+
+
+def card_rank(card):
+    return card & 0xF
+
+
+# The starting state for a game (anything deal_cards accepts)
+def initial_state(cards):
+    stacks = [0] * game.num_stacks
+    for deal in game.normalise_game(cards):
+        stack = 0
+        for rank in range(1, deal.count + 1):
+            stack = stack << 8 | card_code(deal.suit, rank)
+        if deal.extra > 1:
+            stack = stack << 8 | joker_card
+        stacks[deal.stack] = stack
+    return tuple(stacks) + (0,)
+
+
+# The cards in a stack's int, from the back of the stack to the top
+def stack_cards(stack):
+    cards = []
+    while stack:
+        cards.append(stack & 0xFF)
+        stack >>= 8
+    cards.reverse()
+    return cards
+
+
+def stack_size(stack):
+    return (stack.bit_length() + 7) >> 3
+
+
+# The highest rank of a suit that is home
+def home_rank(state, suit):
+    return state[-1] >> (suit << 2) & 0xF
+
+
+def make_move(source, destination):
+    return source << 4 | destination
+
+
+def move_source(move):
+    return move >> 4
+
+
+def move_destination(move):
+    return move & 0xF
+
+
+# Whether a top card can go onto another stack, by
+# lone_card << 16 | card << 8 | top card of the other stack (0 if empty)
+def make_fits_table():
+    table = bytearray(1 << 17)
+    for card in range(1, 256):
+        for target in range(256):
+            if target == 0:
+                fits = True
+            else:
+                fits = (card == joker_card or target == joker_card or
+                        (card ^ target) & 0xF0 and (target & 0xF) == (card & 0xF) + 1)
+            table[card << 8 | target] = fits
+            table[1 << 16 | card << 8 | target] = fits and target != 0
+    return table
+
+fits_table = make_fits_table()
+
+# Every move that can be made from a state, as ints
+def legal_moves(state):
+    homes = state[-1]
+    stacks = state[:-1]
+    tops = [stack & 0xFF for stack in stacks]
+    moves = []
+    for source, stack in enumerate(stacks):
+        if not stack:
+            continue
+        card = stack & 0xFF
+        if card == joker_card or (homes >> ((card >> 4) << 2) & 0xF) >= (card & 0xF) - 1:
+            moves.append(source << 4 | home)
+        base = (stack <= 0xFF) << 16 | card << 8
+        moves += [source << 4 | destination for destination, top in enumerate(tops)
+                  if fits_table[base | top] and destination != source]
+    return moves
+
+
+# The state after a move (which should be one of legal_moves(state))
+def apply_move(state, move):
+    source, destination = move >> 4, move & 0xF
+    stacks = list(state)
+    card = stacks[source] & 0xFF
+    stacks[source] >>= 8
+    if destination == home:
+        if card != joker_card:
+            shift = (card >> 4) << 2
+            rank = card & 0xF
+            homes = stacks[-1]
+            home_now = homes >> shift & 0xF
+            if rank > home_now:
+                stacks[-1] = homes + ((rank - home_now) << shift)
+    else:
+        stacks[destination] = stacks[destination] << 8 | card
+    return tuple(stacks)
+
+
+def is_won(state):
+    return not any(state[:-1])
+
+
+# Cards still on the table
+def cards_left(state):
+    return sum(stack_size(stack) for stack in state[:-1])
+
+
+def describe_card(card):
+    if card == joker_card:
+        return 'Joker'
+    return game.suit_names[card_suit(card)] + ' ' + str(card_rank(card))
+
+
+def describe_move(state, move):
+    destination = move_destination(move)
+    return (describe_card(state[move_source(move)] & 0xFF) + ' from ' +
+            game.stack_names[move_source(move)] + ' to ' +
+            ('home' if destination == home else game.stack_names[destination]))
+
+
+# A render plan (see plan_deal) of the cards on the table in a state, with
+# each card's rank as its card number/id
+def plan_state(state):
+    plan = []
+    for stack_index, stack in enumerate(state[:-1]):
+        cards = stack_cards(stack)
+        placements = game.plan_stack(stack_index,
+                                     [(None, True) if card == joker_card else
+                                      (game.suit_names[card_suit(card)], False)
+                                      for card in cards])
+        for card, placement in zip(cards, placements):
+            if card != joker_card:
+                rank = str(card_rank(card))
+                placement = placement._replace(labels = (rank, rank))
+            plan.append(placement)
+    return plan
+
+
+# Redraw the cards on a table already set up by create_drawing_canvas to
+# show a state
+def show_state(state):
+    game.delete_cards('card')
+    game.draw_plan(plan_state(state))
+
+
+# Play random legal moves from a game's starting state, restarting
+# whenever the game is won or stuck. Returns the moves played, the legal
+# moves generated along the way and the seconds taken. Stops at once if
+# there are no moves from the start.
+def random_playout(cards, moves_wanted, rng = None):
+    rng = rng if rng is not None else Random()
+    start_state = state = initial_state(cards)
+    played = generated = 0
+    start = perf_counter()
+    while played < moves_wanted:
+        moves = legal_moves(state)
+        generated += len(moves)
+        if not moves or is_won(state):
+            if state == start_state:
+                break
+            state = start_state
+            continue
+        state = apply_move(state, moves[int(rng.random() * len(moves))])
+        played += 1
+    return played, generated, perf_counter() - start
+
+
+def main(arguments = None):
+    parser = ArgumentParser(description = 'Time move generation by playing random moves.')
+    parser.add_argument('--seed', type = int, default = 0,
+                        help = "first seed for random_game's games (default 0)")
+    parser.add_argument('--games', type = int, default = 100,
+                        help = 'games to play, one per seed (default 100)')
+    parser.add_argument('--moves', type = int, default = 2000,
+                        help = 'moves to play in each game (default 2000)')
+    options = parser.parse_args(arguments)
+
+    played = generated = seconds = 0
+    for seed in range(options.seed, options.seed + options.games):
+        rng = Random(seed)
+        game_played, game_generated, game_seconds = random_playout(
+            game.random_game(False, rng), options.moves, rng)
+        played += game_played
+        generated += game_generated
+        seconds += game_seconds
+    seconds = max(seconds, 1e-9)
+    print('%d moves played in %.2f s (%.0f moves/s), %d legal moves generated (%.0f moves/s)' %
+          (played, seconds, played / seconds, generated, generated / seconds))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,811 @@
+from turtle import TurtleScreen
+from tkinter import TclError
+from math import *
+from zlib import compress, crc32
+from struct import pack
+
+# Headless drawing surface for the solitaire game.
+#
+# HeadlessCanvas stands in for the Tk canvas that Turtle Graphics normally
+# draws on. It implements the part of the Tk canvas interface that turtle
+# uses (create_polygon, create_line, create_text, coords, itemconfigure,
+# ...) by keeping the canvas items in plain Python data, so no X server or
+# Tk interpreter is needed. HeadlessScreen puts a TurtleScreen on top of it,
+# which means an ordinary RawTurtle draws exactly what it would draw in a
+# window. The finished drawing can then be saved as SVG, PPM or PNG.
+
+# Default size of a headless canvas in pixels
+default_width = 1200
+default_height = 900
+
+# Colour names understood by the headless canvas: the X11 colour database
+# that Tk uses, so any colour name Tk accepts works here too. Each line
+# gives a colour's value and then, for the colours that have them, the
+# values of its numbered shades 1 to 4 (e.g. salmon1 ... salmon4). Names
+# with "gray" can also be spelt "grey", and gray0 to gray100 (or grey0 to
+# grey100) run from black to white.
+x11_colours = """
+aliceblue f0f8ff
+antiquewhite faebd7 ffefdb eedfcc cdc0b0 8b8378
+aquamarine 7fffd4 7fffd4 76eec6 66cdaa 458b74
+azure f0ffff f0ffff e0eeee c1cdcd 838b8b
+beige f5f5dc
+bisque ffe4c4 ffe4c4 eed5b7 cdb79e 8b7d6b
+black 000000
+blanchedalmond ffebcd
+blue 0000ff 0000ff 0000ee 0000cd 00008b
+blueviolet 8a2be2
+brown a52a2a ff4040 ee3b3b cd3333 8b2323
+burlywood deb887 ffd39b eec591 cdaa7d 8b7355
+cadetblue 5f9ea0 98f5ff 8ee5ee 7ac5cd 53868b
+chartreuse 7fff00 7fff00 76ee00 66cd00 458b00
+chocolate d2691e ff7f24 ee7621 cd661d 8b4513
+coral ff7f50 ff7256 ee6a50 cd5b45 8b3e2f
+cornflowerblue 6495ed
+cornsilk fff8dc fff8dc eee8cd cdc8b1 8b8878
+cyan 00ffff 00ffff 00eeee 00cdcd 008b8b
+darkblue 00008b
+darkcyan 008b8b
+darkgoldenrod b8860b ffb90f eead0e cd950c 8b6508
+darkgray a9a9a9
+darkgreen 006400
+darkkhaki bdb76b
+darkmagenta 8b008b
+darkolivegreen 556b2f caff70 bcee68 a2cd5a 6e8b3d
+darkorange ff8c00 ff7f00 ee7600 cd6600 8b4500
+darkorchid 9932cc bf3eff b23aee 9a32cd 68228b
+darkred 8b0000
+darksalmon e9967a
+darkseagreen 8fbc8f c1ffc1 b4eeb4 9bcd9b 698b69
+darkslateblue 483d8b
+darkslategray 2f4f4f 97ffff 8deeee 79cdcd 528b8b
+darkturquoise 00ced1
+darkviolet 9400d3
+debianred d70751
+deeppink ff1493 ff1493 ee1289 cd1076 8b0a50
+deepskyblue 00bfff 00bfff 00b2ee 009acd 00688b
+dimgray 696969
+dodgerblue 1e90ff 1e90ff 1c86ee 1874cd 104e8b
+firebrick b22222 ff3030 ee2c2c cd2626 8b1a1a
+floralwhite fffaf0
+forestgreen 228b22
+gainsboro dcdcdc
+ghostwhite f8f8ff
+gold ffd700 ffd700 eec900 cdad00 8b7500
+goldenrod daa520 ffc125 eeb422 cd9b1d 8b6914
+gray bebebe 030303 050505 080808 0a0a0a
+green 00ff00 00ff00 00ee00 00cd00 008b00
+greenyellow adff2f
+honeydew f0fff0 f0fff0 e0eee0 c1cdc1 838b83
+hotpink ff69b4 ff6eb4 ee6aa7 cd6090 8b3a62
+indianred cd5c5c ff6a6a ee6363 cd5555 8b3a3a
+ivory fffff0 fffff0 eeeee0 cdcdc1 8b8b83
+khaki f0e68c fff68f eee685 cdc673 8b864e
+lavender e6e6fa
+lavenderblush fff0f5 fff0f5 eee0e5 cdc1c5 8b8386
+lawngreen 7cfc00
+lemonchiffon fffacd fffacd eee9bf cdc9a5 8b8970
+lightblue add8e6 bfefff b2dfee 9ac0cd 68838b
+lightcoral f08080
+lightcyan e0ffff e0ffff d1eeee b4cdcd 7a8b8b
+lightgoldenrod eedd82 ffec8b eedc82 cdbe70 8b814c
+lightgoldenrodyellow fafad2
+lightgray d3d3d3
+lightgreen 90ee90
+lightpink ffb6c1 ffaeb9 eea2ad cd8c95 8b5f65
+lightsalmon ffa07a ffa07a ee9572 cd8162 8b5742
+lightseagreen 20b2aa
+lightskyblue 87cefa b0e2ff a4d3ee 8db6cd 607b8b
+lightslateblue 8470ff
+lightslategray 778899
+lightsteelblue b0c4de cae1ff bcd2ee a2b5cd 6e7b8b
+lightyellow ffffe0 ffffe0 eeeed1 cdcdb4 8b8b7a
+limegreen 32cd32
+linen faf0e6
+magenta ff00ff ff00ff ee00ee cd00cd 8b008b
+maroon b03060 ff34b3 ee30a7 cd2990 8b1c62
+mediumaquamarine 66cdaa
+mediumblue 0000cd
+mediumorchid ba55d3 e066ff d15fee b452cd 7a378b
+mediumpurple 9370db ab82ff 9f79ee 8968cd 5d478b
+mediumseagreen 3cb371
+mediumslateblue 7b68ee
+mediumspringgreen 00fa9a
+mediumturquoise 48d1cc
+mediumvioletred c71585
+midnightblue 191970
+mintcream f5fffa
+mistyrose ffe4e1 ffe4e1 eed5d2 cdb7b5 8b7d7b
+moccasin ffe4b5
+navajowhite ffdead ffdead eecfa1 cdb38b 8b795e
+navy 000080
+navyblue 000080
+oldlace fdf5e6
+olivedrab 6b8e23 c0ff3e b3ee3a 9acd32 698b22
+orange ffa500 ffa500 ee9a00 cd8500 8b5a00
+orangered ff4500 ff4500 ee4000 cd3700 8b2500
+orchid da70d6 ff83fa ee7ae9 cd69c9 8b4789
+palegoldenrod eee8aa
+palegreen 98fb98 9aff9a 90ee90 7ccd7c 548b54
+paleturquoise afeeee bbffff aeeeee 96cdcd 668b8b
+palevioletred db7093 ff82ab ee799f cd6889 8b475d
+papayawhip ffefd5
+peachpuff ffdab9 ffdab9 eecbad cdaf95 8b7765
+peru cd853f
+pink ffc0cb ffb5c5 eea9b8 cd919e 8b636c
+plum dda0dd ffbbff eeaeee cd96cd 8b668b
+powderblue b0e0e6
+purple a020f0 9b30ff 912cee 7d26cd 551a8b
+red ff0000 ff0000 ee0000 cd0000 8b0000
+rosybrown bc8f8f ffc1c1 eeb4b4 cd9b9b 8b6969
+royalblue 4169e1 4876ff 436eee 3a5fcd 27408b
+saddlebrown 8b4513
+salmon fa8072 ff8c69 ee8262 cd7054 8b4c39
+sandybrown f4a460
+seagreen 2e8b57 54ff9f 4eee94 43cd80 2e8b57
+seashell fff5ee fff5ee eee5de cdc5bf 8b8682
+sienna a0522d ff8247 ee7942 cd6839 8b4726
+skyblue 87ceeb 87ceff 7ec0ee 6ca6cd 4a708b
+slateblue 6a5acd 836fff 7a67ee 6959cd 473c8b
+slategray 708090 c6e2ff b9d3ee 9fb6cd 6c7b8b
+snow fffafa fffafa eee9e9 cdc9c9 8b8989
+springgreen 00ff7f 00ff7f 00ee76 00cd66 008b45
+steelblue 4682b4 63b8ff 5cacee 4f94cd 36648b
+tan d2b48c ffa54f ee9a49 cd853f 8b5a2b
+thistle d8bfd8 ffe1ff eed2ee cdb5cd 8b7b8b
+tomato ff6347 ff6347 ee5c42 cd4f39 8b3626
+turquoise 40e0d0 00f5ff 00e5ee 00c5cd 00868b
+violet ee82ee
+violetred d02090 ff3e96 ee3a8c cd3278 8b2252
+wheat f5deb3 ffe7ba eed8ae cdba96 8b7e66
+white ffffff
+whitesmoke f5f5f5
+yellow ffff00 ffff00 eeee00 cdcd00 8b8b00
+yellowgreen 9acd32
+"""
+
+colour_names = {}
+for line in x11_colours.split('\n'):
+    if line:
+        name, *values = line.split()
+        for shade, value in enumerate(values):
+            rgb = (int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16))
+            colour_names[name + (str(shade) if shade else '')] = rgb
+        if 'gray' in name:
+            colour_names[name.replace('gray', 'grey')] = colour_names[name]
+for shade in range(101):
+    colour_names['gray' + str(shade)] = colour_names['grey' + str(shade)] = (int(shade * 2.55 + 0.5),) * 3
+# The web colours Tk 8.6 adds to the X11 ones
+colour_names.update({'aqua': (0, 255, 255), 'crimson': (220, 20, 60),
+                     'fuchsia': (255, 0, 255), 'indigo': (75, 0, 130),
+                     'lime': (0, 255, 0), 'olive': (128, 128, 0),
+                     'silver': (192, 192, 192), 'teal': (0, 128, 128)})
+
+# Average character width of each font family, as a fraction of the
+# font's pixel size
+font_widths = {'arial': 0.55, 'helvetica': 0.55, 'consolas': 0.55,
+               'courier': 0.6, 'courier new': 0.6, 'times': 0.5}
+default_font = ('Arial', 8, 'normal') # turtle's default font for write
+
+# Tiny 3x5 bitmap font used when text is rasterised. Each glyph is 15
+# characters, read row by row from the top left.
+glyph_rows = 5
+glyph_cols = 3
+glyphs = {
+    '0': '####.##.##.####', '1': '.#.##..#..#.###', '2': '###..#####..###',
+    '3': '###..####..####', '4': '#.##.####..#..#', '5': '####..###..####',
+    '6': '####..####.####', '7': '###..#..#..#..#', '8': '####.#####.####',
+    '9': '####.####..####', 'A': '.#.#.#####.##.#', 'B': '##.#.###.#.###.',
+    'C': '####..#..#..###', 'D': '##.#.##.##.###.', 'E': '####..##.#..###',
+    'F': '####..##.#..#..', 'G': '####..#.##.####', 'H': '#.##.#####.##.#',
+    'I': '###.#..#..#.###', 'J': '..#..#..##.####', 'K': '#.##.###.#.##.#',
+    'L': '#..#..#..#..###', 'M': '#.########.##.#', 'N': '##.#.##.##.##.#',
+    'O': '####.##.##.####', 'P': '####.#####..#..', 'Q': '####.##.####..#',
+    'R': '##.#.###.#.##.#', 'S': '####..###..####', 'T': '###.#..#..#..#.',
+    'U': '#.##.##.##.####', 'V': '#.##.##.##.#.#.', 'W': '#.##.########.#',
+    'X': '#.##.#.#.#.##.#', 'Y': '#.##.#.#..#..#.', 'Z': '###..#.#.#..###',
+    '-': '......###......', '|': '.#..#..#..#..#.', ':': '....#.....#....',
+    '[': '##.#..#..#..##.', ']': '.##..#..#..#.##', ',': '..........#.#..',
+    '.': '.............#.', '(': '.#.#..#..#...#.', ')': '.#...#..#..#.#.',
+    '?': '###..#.##....#.', ' ': '...............',
+}
+
+
+# Convert a Tk colour specification into an (r, g, b) tuple, or None
+# for the empty string, which Tk treats as transparent
+def parse_colour(colour):
+    if colour is None or colour == '':
+        return None
+    if isinstance(colour, tuple):
+        return colour
+    if colour.startswith('#'):
+        digits = len(colour) - 1
+        if digits in (3, 6, 9, 12) and all(c in '0123456789abcdefABCDEF' for c in colour[1:]):
+            step = digits // 3
+            return tuple(int(colour[1 + i * step:1 + (i + 1) * step], 16) * 255 // (16 ** step - 1)
+                         for i in range(3))
+    else:
+        rgb = colour_names.get(colour.lower().replace(' ', ''))
+        if rgb is not None:
+            return rgb
+    raise TclError('unknown color name "' + str(colour) + '"')
+
+
+# Split a Tk font specification into (family, pixel size, bold)
+def parse_font(font):
+    if font is None or font == '':
+        font = default_font
+    if isinstance(font, str):
+        font = tuple(font.split())
+    family = str(font[0]).lower() if len(font) > 0 else 'arial'
+    point_size = int(font[1]) if len(font) > 1 else 8
+    bold = len(font) > 2 and 'bold' in str(font[2])
+    # Positive Tk font sizes are points, negative ones are pixels
+    pixel_size = -point_size if point_size < 0 else point_size * 4 / 3
+    return family, pixel_size, bold
+
+
+# Estimate how wide a string is (in pixels) when written in a font
+def text_width(string, font = None):
+    family, pixel_size, bold = parse_font(font)
+    char_width = font_widths.get(family, 0.55) * pixel_size * (1.1 if bold else 1)
+    return max(len(line) for line in str(string).split('\n')) * char_width
+
+
+# Height of one line of text in a font, in pixels
+def text_height(font = None):
+    return parse_font(font)[1] * 1.25
+
+
+# A stand-in for the images turtle creates for its "blank" shape
+class HeadlessImage:
+    def __init__(self, width = 1, height = 1):
+        self.width = width
+        self.height = height
+
+    def blank(self):
+        pass
+
+
+class HeadlessCanvas:
+    # Default item options, matching Tk's defaults
+    item_defaults = {
+        'polygon': {'fill': 'black', 'outline': '', 'width': 1},
+        'line': {'fill': 'black', 'width': 1, 'capstyle': 'butt'},
+        'text': {'fill': 'black', 'text': '', 'anchor': 'center', 'angle': 0,
+                 'font': None},
+        'image': {'image': None, 'anchor': 'center'},
+    }
+
+    def __init__(self, width = default_width, height = default_height, bg = 'white'):
+        self.config_options = {'width': width, 'height': height, 'bg': bg,
+                               'scrollregion': (-width // 2, -height // 2,
+                                                width // 2, height // 2)}
+        # Each item is [type, coordinates, options, tags], stored by id;
+        # the display list holds ids from bottom to top
+        self.items = {}
+        self.display_list = []
+        self.next_id = 1
+        self.bindings = {}
+        # Pending "after" callbacks as [due time, id, function, args]
+        self.timers = []
+        self.clock = 0
+        self.next_timer = 1
+
+    # Canvas configuration
+
+    def config(self, cnf = None, **options):
+        if cnf:
+            options.update(cnf)
+        if 'background' in options:
+            options['bg'] = options.pop('background')
+        self.config_options.update(options)
+
+    configure = config
+
+    def cget(self, key):
+        if key == 'background':
+            key = 'bg'
+        return self.config_options[key]
+
+    __getitem__ = cget
+
+    def winfo_width(self):
+        return self.config_options['width']
+
+    def winfo_height(self):
+        return self.config_options['height']
+
+    def winfo_rgb(self, colour):
+        return tuple(value * 257 for value in parse_colour(colour))
+
+    # Change the canvas size, keeping (0, 0) in the centre
+    def resize(self, width, height):
+        self.config(width = width, height = height,
+                    scrollregion = (-width // 2, -height // 2, width // 2, height // 2))
+
+    # Creating items
+
+    def create_item(self, item_type, args, options):
+        coordinates = []
+        settings = dict(self.item_defaults[item_type])
+        for arg in args:
+            if isinstance(arg, dict):
+                settings.update(arg)
+            elif isinstance(arg, (tuple, list)):
+                coordinates.extend(float(value) for value in arg)
+            else:
+                coordinates.append(float(arg))
+        settings.update(options)
+        tags = settings.pop('tags', ())
+        if isinstance(tags, str):
+            tags = tags.split()
+        item = self.next_id
+        self.next_id += 1
+        self.items[item] = [item_type, coordinates, settings, list(tags)]
+        self.display_list.append(item)
+        return item
+
+    def create_polygon(self, *args, **options):
+        return self.create_item('polygon', args, options)
+
+    def create_line(self, *args, **options):
+        return self.create_item('line', args, options)
+
+    def create_text(self, *args, **options):
+        return self.create_item('text', args, options)
+
+    def create_image(self, *args, **options):
+        return self.create_item('image', args, options)
+
+    # Finding items
+
+    def find_withtag(self, tag_or_id):
+        if isinstance(tag_or_id, int) or str(tag_or_id).isdigit():
+            item = int(tag_or_id)
+            return (item,) if item in self.items else ()
+        if tag_or_id == 'all':
+            return tuple(self.display_list)
+        return tuple(item for item in self.display_list
+                     if tag_or_id in self.items[item][3])
+
+    def find_all(self):
+        return tuple(self.display_list)
+
+    def type(self, tag_or_id):
+        found = self.find_withtag(tag_or_id)
+        return self.items[found[0]][0] if found else None
+
+    def gettags(self, tag_or_id):
+        found = self.find_withtag(tag_or_id)
+        return tuple(self.items[found[0]][3]) if found else ()
+
+    # Changing items
+
+    def coords(self, tag_or_id, *args):
+        found = self.find_withtag(tag_or_id)
+        if not args:
+            return list(self.items[found[0]][1]) if found else []
+        coordinates = []
+        for arg in args:
+            if isinstance(arg, (tuple, list)):
+                coordinates.extend(float(value) for value in arg)
+            else:
+                coordinates.append(float(arg))
+        for item in found:
+            self.items[item][1] = list(coordinates)
+
+    def itemconfigure(self, tag_or_id, cnf = None, **options):
+        if cnf:
+            options.update(cnf)
+        for item in self.find_withtag(tag_or_id):
+            settings = self.items[item][2]
+            if 'tags' in options:
+                tags = options['tags']
+                self.items[item][3] = tags.split() if isinstance(tags, str) else list(tags)
+            settings.update((key, value) for key, value in options.items() if key != 'tags')
+
+    itemconfig = itemconfigure
+
+    def itemcget(self, tag_or_id, option):
+        found = self.find_withtag(tag_or_id)
+        if not found:
+            return ''
+        if option == 'tags':
+            return ' '.join(self.items[found[0]][3])
+        return self.items[found[0]][2].get(option, '')
+
+    def move(self, tag_or_id, x_amount, y_amount):
+        for item in self.find_withtag(tag_or_id):
+            coordinates = self.items[item][1]
+            for index in range(0, len(coordinates), 2):
+                coordinates[index] += x_amount
+                coordinates[index + 1] += y_amount
+
+    def delete(self, *tags_or_ids):
+        doomed = set()
+        for tag_or_id in tags_or_ids:
+            doomed.update(self.find_withtag(tag_or_id))
+        if doomed:
+            for item in doomed:
+                del self.items[item]
+            self.display_list = [item for item in self.display_list if item not in doomed]
+
+    def addtag_withtag(self, new_tag, tag_or_id):
+        for item in self.find_withtag(tag_or_id):
+            if new_tag not in self.items[item][3]:
+                self.items[item][3].append(new_tag)
+
+    def dtag(self, tag_or_id, tag_to_delete = None):
+        if tag_to_delete is None:
+            tag_to_delete = tag_or_id
+        for item in self.find_withtag(tag_or_id):
+            tags = self.items[item][3]
+            if tag_to_delete in tags:
+                tags.remove(tag_to_delete)
+
+    def tag_raise(self, tag_or_id, above_this = None):
+        raised = self.find_withtag(tag_or_id)
+        rest = [item for item in self.display_list if item not in raised]
+        if above_this is None:
+            self.display_list = rest + list(raised)
+        else:
+            position = rest.index(self.find_withtag(above_this)[-1]) + 1
+            self.display_list = rest[:position] + list(raised) + rest[position:]
+
+    lift = tag_raise
+
+    def tag_lower(self, tag_or_id, below_this = None):
+        lowered = self.find_withtag(tag_or_id)
+        rest = [item for item in self.display_list if item not in lowered]
+        if below_this is None:
+            self.display_list = list(lowered) + rest
+        else:
+            position = rest.index(self.find_withtag(below_this)[0])
+            self.display_list = rest[:position] + list(lowered) + rest[position:]
+
+    lower = tag_lower
+
+    # Geometry
+
+    # Bounding box of one item as (x0, y0, x1, y1) floats
+    def item_bbox(self, item):
+        item_type, coordinates, settings, tags = self.items[item]
+        if item_type == 'text':
+            x, y = coordinates[:2]
+            width = text_width(settings['text'], settings['font'])
+            height = text_height(settings['font']) * (str(settings['text']).count('\n') + 1)
+            left, top = self.anchor_offset(settings['anchor'], width, height)
+            return x + left, y + top, x + left + width, y + top + height
+        if not coordinates:
+            return None
+        xs = coordinates[0::2]
+        ys = coordinates[1::2]
+        margin = float(settings.get('width', 0)) / 2
+        return min(xs) - margin, min(ys) - margin, max(xs) + margin, max(ys) + margin
+
+    # Offset from a text item's anchor point to its top left corner
+    def anchor_offset(self, anchor, width, height):
+        left = -width / 2
+        top = -height / 2
+        if anchor == 'center':
+            return left, top
+        if 'w' in anchor:
+            left = 0
+        elif 'e' in anchor:
+            left = -width
+        if anchor.startswith('n'):
+            top = 0
+        elif anchor.startswith('s'):
+            top = -height
+        return left, top
+
+    def bbox(self, *tags_or_ids):
+        boxes = [self.item_bbox(item) for tag_or_id in tags_or_ids
+                 for item in self.find_withtag(tag_or_id)]
+        boxes = [box for box in boxes if box is not None]
+        if not boxes:
+            return None
+        return (int(floor(min(box[0] for box in boxes))), int(floor(min(box[1] for box in boxes))),
+                int(ceil(max(box[2] for box in boxes))), int(ceil(max(box[3] for box in boxes))))
+
+    def canvasx(self, screen_x):
+        return screen_x + self.config_options['scrollregion'][0]
+
+    def canvasy(self, screen_y):
+        return screen_y + self.config_options['scrollregion'][1]
+
+    # Events and timers. There is no event loop, so "after" callbacks wait
+    # in a queue until run_timers is called, using a simulated clock.
+
+    def update(self):
+        pass
+
+    update_idletasks = update
+
+    def after(self, delay, function = None, *args):
+        if function is None:
+            return None
+        timer = 'after#' + str(self.next_timer)
+        self.next_timer += 1
+        self.timers.append([self.clock + int(delay), timer, function, args])
+        return timer
+
+    def after_idle(self, function, *args):
+        return self.after(0, function, *args)
+
+    def after_cancel(self, timer):
+        self.timers = [entry for entry in self.timers if entry[1] != timer]
+
+    # Run pending "after" callbacks in time order; returns how many ran
+    def run_timers(self, limit = None):
+        count = 0
+        while self.timers and (limit is None or count < limit):
+            self.timers.sort(key = lambda entry: (entry[0], int(entry[1][6:])))
+            due, timer, function, args = self.timers.pop(0)
+            self.clock = max(self.clock, due)
+            function(*args)
+            count += 1
+        return count
+
+    def bind(self, sequence = None, function = None, add = None):
+        self.bindings[(None, sequence)] = function
+
+    def unbind(self, sequence, function_id = None):
+        self.bindings.pop((None, sequence), None)
+
+    def tag_bind(self, tag_or_id, sequence = None, function = None, add = None):
+        self.bindings[(tag_or_id, sequence)] = function
+
+    def tag_unbind(self, tag_or_id, sequence, function_id = None):
+        self.bindings.pop((tag_or_id, sequence), None)
+
+    def focus_force(self):
+        pass
+
+    # Output
+
+    # Items that actually show something, from bottom to top
+    def visible_items(self):
+        for item in self.display_list:
+            item_type, coordinates, settings, tags = self.items[item]
+            if item_type == 'image':
+                continue
+            if item_type == 'text':
+                if str(settings['text']) != '' and settings['fill'] != '':
+                    yield item_type, coordinates, settings
+            elif item_type == 'line':
+                if settings['fill'] != '' and len(coordinates) >= 4:
+                    yield item_type, coordinates, settings
+            elif (settings['fill'] != '' or settings['outline'] != '') and len(coordinates) >= 6:
+                yield item_type, coordinates, settings
+
+    def to_svg(self):
+        x0, y0, x1, y1 = self.config_options['scrollregion']
+        parts = ['<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" '
+                 'viewBox="%g %g %g %g">' % (x1 - x0, y1 - y0, x0, y0, x1 - x0, y1 - y0),
+                 '<rect x="%g" y="%g" width="%g" height="%g" fill="%s"/>'
+                 % (x0, y0, x1 - x0, y1 - y0, svg_colour(self.config_options['bg']))]
+        for item_type, coordinates, settings in self.visible_items():
+            points = ' '.join('%.2f,%.2f' % (coordinates[i], coordinates[i + 1])
+                              for i in range(0, len(coordinates) - 1, 2))
+            if item_type == 'polygon':
+                parts.append('<polygon points="%s" fill="%s" stroke="%s" stroke-width="%g" '
+                             'fill-rule="evenodd"/>'
+                             % (points, svg_colour(settings['fill']),
+                                svg_colour(settings['outline']), float(settings['width'])))
+            elif item_type == 'line':
+                parts.append('<polyline points="%s" fill="none" stroke="%s" stroke-width="%g" '
+                             'stroke-linecap="%s" stroke-linejoin="round"/>'
+                             % (points, svg_colour(settings['fill']), float(settings['width']),
+                                'round' if settings['capstyle'] == 'round' else 'butt'))
+            else:
+                family, pixel_size, bold = parse_font(settings['font'])
+                width = text_width(settings['text'], settings['font'])
+                height = text_height(settings['font'])
+                left, top = self.anchor_offset(settings['anchor'], width, height)
+                x, y = coordinates[:2]
+                text = str(settings['text']).replace('&', '&amp;').replace('<', '&lt;')
+                parts.append('<text x="%.2f" y="%.2f" font-family="%s" font-size="%.1f"%s '
+                             'fill="%s" transform="rotate(%g %.2f %.2f)">%s</text>'
+                             % (x + left, y + top + height * 0.8, family, pixel_size,
+                                ' font-weight="bold"' if bold else '',
+                                svg_colour(settings['fill']), -float(settings['angle']),
+                                x, y, text))
+        parts.append('</svg>')
+        return '\n'.join(parts)
+
+    # Rasterise the canvas into a bytearray of RGB pixels
+    def render(self):
+        x0, y0, x1, y1 = self.config_options['scrollregion']
+        raster = Raster(int(x1 - x0), int(y1 - y0), parse_colour(self.config_options['bg']))
+        for item_type, coordinates, settings in self.visible_items():
+            points = [(coordinates[i] - x0, coordinates[i + 1] - y0)
+                      for i in range(0, len(coordinates) - 1, 2)]
+            if item_type == 'polygon':
+                fill = parse_colour(settings['fill'])
+                if fill is not None:
+                    raster.fill_polygon(points, fill)
+                outline = parse_colour(settings['outline'])
+                if outline is not None:
+                    raster.draw_line(points + points[:1], outline, float(settings['width']), False)
+            elif item_type == 'line':
+                raster.draw_line(points, parse_colour(settings['fill']), float(settings['width']),
+                                 settings['capstyle'] == 'round')
+            else:
+                width = text_width(settings['text'], settings['font'])
+                height = text_height(settings['font'])
+                left, top = self.anchor_offset(settings['anchor'], width, height)
+                raster.draw_text(str(settings['text']), points[0], left, top, width, height,
+                                 float(settings['angle']), parse_colour(settings['fill']))
+        return raster
+
+    def save_svg(self, filename):
+        with open(filename, 'w') as svg_file:
+            svg_file.write(self.to_svg())
+
+    def save_ppm(self, filename):
+        with open(filename, 'wb') as ppm_file:
+            ppm_file.write(self.render().to_ppm())
+
+    def save_png(self, filename):
+        with open(filename, 'wb') as png_file:
+            png_file.write(self.render().to_png())
+
+    # Save the drawing, choosing the format from the file name
+    def save(self, filename):
+        extension = filename.rsplit('.', 1)[-1].lower()
+        if extension == 'svg':
+            self.save_svg(filename)
+        elif extension in ('ppm', 'pnm'):
+            self.save_ppm(filename)
+        elif extension == 'png':
+            self.save_png(filename)
+        else:
+            raise ValueError('Unsupported image format: ' + filename)
+
+
+# Colour for an SVG attribute ("none" for Tk's transparent colour)
+def svg_colour(colour):
+    rgb = parse_colour(colour)
+    if rgb is None:
+        return 'none'
+    return '#%02x%02x%02x' % rgb
+
+
+# A simple RGB pixel buffer with scanline polygon filling
+class Raster:
+    def __init__(self, width, height, background = None):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(bytes(background or (255, 255, 255)) * (width * height))
+
+    # Fill a polygon (even-odd rule, sampled at pixel centres)
+    def fill_polygon(self, points, rgb):
+        if len(points) < 3:
+            return
+        edges = [(xa, ya, xb, yb) for (xa, ya), (xb, yb) in zip(points, points[1:] + points[:1])
+                 if ya != yb]
+        if not edges:
+            return
+        ys = [y for x, y in points]
+        first_row = max(0, int(ceil(min(ys) - 0.5)))
+        last_row = min(self.height - 1, int(floor(max(ys) - 0.5)))
+        colour = bytes(rgb)
+        pixels = self.pixels
+        for row in range(first_row, last_row + 1):
+            centre = row + 0.5
+            crossings = sorted(xa + (centre - ya) * (xb - xa) / (yb - ya)
+                               for xa, ya, xb, yb in edges
+                               if (ya <= centre < yb) or (yb <= centre < ya))
+            for index in range(0, len(crossings) - 1, 2):
+                start = max(0, int(ceil(crossings[index] - 0.5)))
+                end = min(self.width - 1, int(floor(crossings[index + 1] - 0.5)))
+                if end >= start:
+                    offset = (row * self.width + start) * 3
+                    pixels[offset:offset + (end - start + 1) * 3] = colour * (end - start + 1)
+
+    # Fill a disc, used for dots and round line caps
+    def fill_disc(self, centre, diameter, rgb):
+        sides = 16
+        radius = diameter / 2
+        self.fill_polygon([(centre[0] + radius * cos(2 * pi * side / sides),
+                            centre[1] + radius * sin(2 * pi * side / sides))
+                           for side in range(sides)], rgb)
+
+    # Draw a polyline of the given width
+    def draw_line(self, points, rgb, width, round_caps):
+        width = max(width, 1)
+        if round_caps and width > 2:
+            for point in points:
+                self.fill_disc(point, width, rgb)
+        for (xa, ya), (xb, yb) in zip(points, points[1:]):
+            length = hypot(xb - xa, yb - ya)
+            if length == 0:
+                continue
+            dx = (yb - ya) / length * width / 2
+            dy = -(xb - xa) / length * width / 2
+            self.fill_polygon([(xa + dx, ya + dy), (xb + dx, yb + dy),
+                               (xb - dx, yb - dy), (xa - dx, ya - dy)], rgb)
+
+    # Draw text with the built-in bitmap font, filling the box whose top
+    # left corner is (left, top) from the anchor, rotated about the anchor
+    def draw_text(self, text, anchor, left, top, width, height, angle, rgb):
+        if rgb is None or not text:
+            return
+        advance = width / max(len(text), 1)
+        cell_width = advance / (glyph_cols + 1)
+        cell_height = height * 0.7 / glyph_rows
+        glyph_top = top + height * 0.15
+        cosine = cos(radians(angle))
+        sine = sin(radians(angle))
+
+        # Tk angles are anticlockwise, canvas y points down
+        def place(x, y):
+            return (anchor[0] + x * cosine + y * sine, anchor[1] - x * sine + y * cosine)
+
+        for position, char in enumerate(text):
+            glyph = glyphs.get(char.upper(), glyphs['?'])
+            for cell, lit in enumerate(glyph):
+                if lit != '#':
+                    continue
+                x = left + position * advance + (cell % glyph_cols) * cell_width
+                y = glyph_top + (cell // glyph_cols) * cell_height
+                self.fill_polygon([place(x, y), place(x + cell_width, y),
+                                   place(x + cell_width, y + cell_height),
+                                   place(x, y + cell_height)], rgb)
+
+    def to_ppm(self):
+        return b'P6\n%d %d\n255\n' % (self.width, self.height) + bytes(self.pixels)
+
+    def to_png(self):
+        row_bytes = self.width * 3
+        scanlines = b''.join(b'\x00' + bytes(self.pixels[row * row_bytes:(row + 1) * row_bytes])
+                             for row in range(self.height))
+
+        def chunk(kind, data):
+            return pack('>I', len(data)) + kind + data + pack('>I', crc32(kind + data) & 0xffffffff)
+
+        return (b'\x89PNG\r\n\x1a\n'
+                + chunk(b'IHDR', pack('>IIBBBBB', self.width, self.height, 8, 2, 0, 0, 0))
+                + chunk(b'IDAT', compress(scanlines, 6))
+                + chunk(b'IEND', b''))
+
+
+# A turtle screen drawing onto a HeadlessCanvas. It provides the window
+# functions (setup, title, done, ...) that the Tk screen has, so code written
+# for the normal turtle window runs unchanged.
+class HeadlessScreen(TurtleScreen):
+    def __init__(self, width = default_width, height = default_height):
+        self.window_title = ''
+        TurtleScreen.__init__(self, HeadlessCanvas(width, height))
+
+    def _blankimage(self):
+        return HeadlessImage()
+
+    def _image(self, filename):
+        return HeadlessImage()
+
+    def setup(self, width = default_width, height = default_height, startx = None, starty = None):
+        self.cv.resize(int(width), int(height))
+        self.canvwidth = int(width)
+        self.canvheight = int(height)
+
+    def title(self, titlestring):
+        self.window_title = titlestring
+
+    # There is no window to wait for, so just run any pending timers
+    def mainloop(self):
+        self.cv.run_timers()
+
+    done = mainloop
+
+    def bye(self):
+        pass
+
+    def exitonclick(self):
+        pass
+
+    def save(self, filename):
+        self.update()
+        self.cv.save(filename)
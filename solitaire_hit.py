@@ -0,0 +1,148 @@
+from argparse import ArgumentParser
+from math import floor
+
+import turtle_solitaire_game as game
+
+# Finding the card under a click.
+#
+# A CardHitIndex keeps the rectangle (the bounds of the drawn card
+# outline, whose rounded corners reach radius beyond card_width and
+# 2*radius below card_height) and drawing order of every card on the
+# table, filed in a uniform grid of card-sized cells. A card covers at most four cells, so
+# finding the card at a point only means checking the few cards filed in
+# that point's cell, however many cards are on the table; of those that
+# contain the point, the one drawn last is on top. Cards are known by
+# their card tag (e.g. 'stack_3_card_2', see Tagged cards), so the index
+# can be kept in step with the canvas as cards move: move_card moves a
+# card's items and its rectangle together and brings it to the front.
+#
+#   index = CardHitIndex.from_plan(plan_deal(game))
+#   on_card_click(index, lambda tag, x, y: print(tag))
+
+
+class CardHitIndex:
+    def __init__(self, cell_width = None, cell_height = None):
+        # The card outline's extent around the card's top left corner
+        points, turn = game.fixed_path(game.card_outline_moves)
+        self.left = min(x for x, y in points)
+        self.right = max(x for x, y in points)
+        self.bottom = min(y for x, y in points)
+        self.top = max(y for x, y in points)
+        self.cell_width = cell_width or self.right - self.left
+        self.cell_height = cell_height or self.top - self.bottom
+        self.cards = {} # card tag -> (x, y, z), with (x, y) the top left corner
+        self.cells = {} # (column, row) -> set of card tags
+        self.next_z = 0
+
+    # An index of the cards in a render plan (see plan_deal)
+    @classmethod
+    def from_plan(cls, plan):
+        index = cls()
+        for placement in plan:
+            index.add(game.placement_tags(placement)[-1], placement.x, placement.y)
+        return index
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __contains__(self, tag):
+        return tag in self.cards
+
+    # The grid cells a card with its top left corner at (x, y) covers
+    def card_cells(self, x, y):
+        first_column = floor((x + self.left) / self.cell_width)
+        last_column = floor((x + self.right) / self.cell_width)
+        first_row = floor((y + self.bottom) / self.cell_height)
+        last_row = floor((y + self.top) / self.cell_height)
+        return [(column, row) for column in range(first_column, last_column + 1)
+                for row in range(first_row, last_row + 1)]
+
+    # Add a card on top of the others (or at drawing order z)
+    def add(self, tag, x, y, z = None):
+        if tag in self.cards:
+            self.remove(tag)
+        if z is None:
+            z = self.next_z
+        self.next_z = max(self.next_z, z + 1)
+        self.cards[tag] = (x, y, z)
+        for cell in self.card_cells(x, y):
+            self.cells.setdefault(cell, set()).add(tag)
+
+    def remove(self, tag):
+        x, y, z = self.cards.pop(tag)
+        for cell in self.card_cells(x, y):
+            tags = self.cells[cell]
+            tags.discard(tag)
+            if not tags:
+                del self.cells[cell]
+
+    # Move a card's top left corner to (x, y), keeping its drawing order
+    def move_to(self, tag, x, y):
+        z = self.cards[tag][2]
+        self.remove(tag)
+        self.add(tag, x, y, z)
+
+    def move(self, tag, x_distance, y_distance):
+        x, y, z = self.cards[tag]
+        self.move_to(tag, x + x_distance, y + y_distance)
+
+    # Put a card on top of the others
+    def raise_card(self, tag):
+        x, y, z = self.cards[tag]
+        self.cards[tag] = (x, y, self.next_z)
+        self.next_z += 1
+
+    # The tags of the cards containing a point, the top card first
+    def cards_at(self, x, y):
+        hits = []
+        for tag in self.cells.get((floor(x / self.cell_width), floor(y / self.cell_height)), ()):
+            x_card, y_card, z = self.cards[tag]
+            if (x_card + self.left <= x <= x_card + self.right and
+                    y_card + self.bottom <= y <= y_card + self.top):
+                hits.append((z, tag))
+        hits.sort(reverse = True)
+        return [tag for z, tag in hits]
+
+    # The tag of the top card containing a point, or None
+    def card_at(self, x, y):
+        top_z, top_tag = -1, None
+        for tag in self.cells.get((floor(x / self.cell_width), floor(y / self.cell_height)), ()):
+            x_card, y_card, z = self.cards[tag]
+            if (z > top_z and x_card + self.left <= x <= x_card + self.right and
+                    y_card + self.bottom <= y <= y_card + self.top):
+                top_z, top_tag = z, tag
+        return top_tag
+
+
+# Move a card's items on the canvas by the given distances (in turtle
+# coordinates), bring it to the front and update the index to match
+def move_card(index, tag, x_distance, y_distance):
+    game.move_cards(tag, x_distance, y_distance)
+    game.raise_cards(tag)
+    index.move(tag, x_distance, y_distance)
+    index.raise_card(tag)
+
+
+# Call handler(card tag or None, x, y) whenever the table is clicked
+def on_card_click(index, handler, button = 1):
+    game.getscreen().onscreenclick(lambda x, y: handler(index.card_at(x, y), x, y), button)
+
+
+def main(arguments = None):
+    parser = ArgumentParser(description = 'Deal a random game and name the card under each click.')
+    parser.parse_args(arguments)
+
+    game.create_drawing_canvas(False)
+    game.tracer(False)
+    game.title('Click a card')
+    plan = game.plan_deal(game.random_game(False))
+    game.draw_plan(plan)
+    index = CardHitIndex.from_plan(plan)
+    on_card_click(index, lambda tag, x, y: print(tag or 'no card', 'at', (x, y)))
+    game.update()
+    game.done()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
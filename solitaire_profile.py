@@ -0,0 +1,197 @@
+from argparse import ArgumentParser
+from json import dump
+from random import Random
+from time import perf_counter
+import sys
+
+import turtle_solitaire_game as game
+
+# Profiler for the drawing code.
+#
+# While a DrawingProfiler is running, every turtle function the drawing
+# code calls (forward, circle, goto, stamp, write, begin_fill, ...) and
+# every canvas item it creates or changes directly is counted and timed.
+# Each call is recorded against the chain of drawing functions that made
+# it, e.g. deal_cards > draw_plan > Suit_2 > draw_suit > draw_artwork >
+# compile_sprite > trace_artwork > draw_shapes > stamp_seeds. Nothing is
+# wrapped until the profiler starts, so when it isn't running the drawing
+# code pays nothing for it.
+#
+#   with DrawingProfiler() as profiler:
+#       deal_cards(full_game)
+#   profiler.save_json('profile.json')
+#   profiler.save_folded('profile.folded') # for flamegraph.pl / speedscope
+
+# Canvas methods the drawing code calls directly
+canvas_methods = ['create_polygon', 'create_line', 'create_text', 'coords',
+                  'itemconfigure', 'move', 'delete']
+
+
+class DrawingProfiler:
+    def __init__(self, include_canvas = True):
+        self.include_canvas = include_canvas
+        # {(calling functions..., call name): [calls, seconds]}
+        self.stats = {}
+        self.saved = None
+        self.wrapped_canvases = []
+
+    # Wrap one function so that calls made from the drawing code are
+    # recorded against the functions that made them
+    def wrap(self, name, function):
+        stats = self.stats
+        drawing_globals = vars(game)
+
+        def profiled(*args, **kwargs):
+            frame = sys._getframe(1)
+            if frame.f_globals is not drawing_globals:
+                # Called from inside turtle, not by the drawing code
+                return function(*args, **kwargs)
+            callers = []
+            while frame is not None and frame.f_globals is drawing_globals:
+                callers.append(frame.f_code.co_name)
+                frame = frame.f_back
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds = perf_counter() - start
+                key = tuple(reversed(callers)) + (name,)
+                entry = stats.get(key)
+                if entry is None:
+                    stats[key] = [1, seconds]
+                else:
+                    entry[0] += 1
+                    entry[1] += seconds
+
+        return profiled
+
+    def wrap_bindings(self, bindings):
+        return {name: self.wrap(name, function) for name, function in bindings.items()}
+
+    def wrap_canvas(self, canvas):
+        if not self.include_canvas or canvas in self.wrapped_canvases:
+            return
+        for method in canvas_methods:
+            setattr(canvas, method, self.wrap('canvas.' + method, getattr(canvas, method)))
+        self.wrapped_canvases.append(canvas)
+
+    def start(self):
+        names = game.turtle_functions + game.screen_functions
+        self.saved = {name: getattr(game, name) for name in names}
+        self.saved['headless_bindings'] = game.headless_bindings
+        for name, function in self.wrap_bindings({name: self.saved[name] for name in names}).items():
+            setattr(game, name, function)
+
+        # Screens created while profiling (e.g. to compile sprites) are
+        # profiled too
+        def profiled_headless_bindings(width, height):
+            bindings = self.saved['headless_bindings'](width, height)
+            self.wrap_canvas(bindings['getscreen']().cv)
+            return self.wrap_bindings(bindings)
+
+        game.headless_bindings = profiled_headless_bindings
+        self.wrap_canvas(self.saved['getscreen']().cv)
+        return self
+
+    def stop(self):
+        for name, function in self.saved.items():
+            setattr(game, name, function)
+        for canvas in self.wrapped_canvases:
+            for method in canvas_methods:
+                delattr(canvas, method)
+        self.wrapped_canvases = []
+        self.saved = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exception):
+        self.stop()
+
+    # Results
+
+    # Total calls of each function, by name
+    def primitive_counts(self):
+        counts = {}
+        for key, (calls, seconds) in self.stats.items():
+            counts[key[-1]] = counts.get(key[-1], 0) + calls
+        return counts
+
+    # {drawing function: {call name: [calls, seconds]}}, where the drawing
+    # function is the innermost Suit_* function (or card_identifier, or
+    # whatever drawing function made the call when there is no suit)
+    def by_function(self):
+        table = {}
+        for key, (calls, seconds) in self.stats.items():
+            callers = key[:-1]
+            owner = callers[-1] if callers else '(top level)'
+            for caller in reversed(callers):
+                if caller.startswith('Suit_') or caller == 'card_identifier':
+                    owner = caller
+                    break
+            entry = table.setdefault(owner, {}).setdefault(key[-1], [0, 0.0])
+            entry[0] += calls
+            entry[1] += seconds
+        return table
+
+    def to_json(self):
+        return {'functions': {owner: {name: {'calls': calls, 'seconds': seconds}
+                                      for name, (calls, seconds) in sorted(calls_by_name.items())}
+                              for owner, calls_by_name in sorted(self.by_function().items())},
+                'stacks': [{'stack': list(key[:-1]), 'call': key[-1],
+                            'calls': calls, 'seconds': seconds}
+                           for key, (calls, seconds) in sorted(self.stats.items())]}
+
+    # Folded stacks ("a;b;c value" lines), with the time in microseconds,
+    # as read by flamegraph.pl and speedscope
+    def folded(self):
+        return '\n'.join(';'.join(key) + ' ' + str(max(1, round(seconds * 1000000)))
+                         for key, (calls, seconds) in sorted(self.stats.items())) + '\n'
+
+    def save_json(self, filename):
+        with open(filename, 'w') as json_file:
+            dump(self.to_json(), json_file, indent = 1)
+
+    def save_folded(self, filename):
+        with open(filename, 'w') as folded_file:
+            folded_file.write(self.folded())
+
+    def print_summary(self):
+        for owner, calls_by_name in sorted(self.by_function().items()):
+            total_calls = sum(calls for calls, seconds in calls_by_name.values())
+            total_seconds = sum(seconds for calls, seconds in calls_by_name.values())
+            print('%-24s %7d calls %9.2f ms' % (owner, total_calls, total_seconds * 1000))
+            for name, (calls, seconds) in sorted(calls_by_name.items(),
+                                                 key = lambda entry: -entry[1][1]):
+                print('    %-20s %7d calls %9.2f ms' % (name, calls, seconds * 1000))
+
+
+def main(arguments = None):
+    parser = ArgumentParser(description = 'Profile the turtle calls made while dealing a game.')
+    parser.add_argument('dataset', nargs = '?', default = 'full_game',
+                        help = 'fixed_game_0 ... fixed_game_17 or full_game (default)')
+    parser.add_argument('--no-sprites', action = 'store_true',
+                        help = 'draw every card with the turtle instead of the sprite cache')
+    parser.add_argument('--json', help = 'write the profile to this JSON file')
+    parser.add_argument('--folded', help = 'write folded stacks to this file')
+    options = parser.parse_args(arguments)
+
+    if options.dataset == 'full_game':
+        cards = game.make_full_game(Random(0))
+    else:
+        cards = getattr(game, options.dataset)
+    game.use_sprite_cache = not options.no_sprites
+    game.use_backend('headless')
+    game.tracer(False)
+    with DrawingProfiler() as profiler:
+        game.deal_cards(cards)
+        game.update()
+    profiler.print_summary()
+    if options.json:
+        profiler.save_json(options.json)
+    if options.folded:
+        profiler.save_folded(options.folded)
+
+
+if __name__ == '__main__':
+    main()
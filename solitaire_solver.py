@@ -0,0 +1,241 @@
+from argparse import ArgumentParser
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from json import dump
+from os import cpu_count
+from random import Random
+from time import perf_counter
+
+import turtle_solitaire_game as game
+from solitaire_batch import chunked, parse_seed_range
+from solitaire_engine import (apply_move, home, initial_state, is_won, joker_card,
+                              legal_moves)
+
+# Solving games.
+#
+# solve searches depth first through the moves of a game (see
+# solitaire_engine.py) for a way to get every card home. Its moves are
+# tried in order of promise: cards going home first, then cards moving onto
+# other cards (from the shortest stacks first, as they are closest to
+# being cleared), then cards moving to empty stacks, then the joker. The
+# rules treat every stack alike, so states that differ only in which
+# stack is which are the same position; a transposition table records the
+# positions already searched to a dead end, by their stacks in sorted
+# order, so none is searched twice. The table holds at most table_size
+# positions (the oldest half is dropped when it fills up, at the cost of
+# maybe searching those again), and a search gives up after max_nodes
+# positions, so every game is solved in bounded time and memory.
+#
+# solve_seeds solves random_game's games for a range of seeds over a pool
+# of worker processes, for statistics on how many games can be won and
+# how long they take to solve, e.g. to tune extra_probability and
+# max_cards:
+#
+#   python solitaire_solver.py --seeds 0:1000
+#   python solitaire_solver.py --seeds 0:1000 --max-cards 8 --extra-probability 40
+
+default_max_nodes = 50000
+default_table_size = 200000
+default_chunk_size = 25 # games sent to a worker at a time
+
+# outcome is 'won', 'lost' (no way to win) or 'unknown' (gave up after
+# max_nodes positions); moves is the winning moves, if won
+SolveResult = namedtuple('SolveResult', ['outcome', 'moves', 'nodes', 'seconds'])
+
+
+# The position a state is in, whichever stacks its cards are on
+def position_key(state):
+    return tuple(sorted(state[:-1])) + state[-1:]
+
+
+# Order a move for the search, lowest first
+def move_priority(state, move):
+    source, destination = move >> 4, move & 0xF
+    if state[source] & 0xFF == joker_card:
+        return 4 if destination == home else 5
+    if destination == home:
+        return 0
+    if state[destination]:
+        return 1 + state[source].bit_length() / 1024
+    return 3
+
+
+def ordered_moves(state):
+    return sorted(legal_moves(state), key = lambda move: move_priority(state, move))
+
+
+def solve(state, max_nodes = default_max_nodes, table_size = default_table_size):
+    start = perf_counter()
+    if is_won(state):
+        return SolveResult('won', [], 1, perf_counter() - start)
+    dead_ends = {} # position keys, oldest first
+    on_path = {position_key(state)}
+    path = []
+    search = [(state, iter(ordered_moves(state)))]
+    nodes = 1
+    while search:
+        current, moves = search[-1]
+        for move in moves:
+            child = apply_move(current, move)
+            if is_won(child):
+                return SolveResult('won', path + [move], nodes, perf_counter() - start)
+            key = position_key(child)
+            if key in dead_ends or key in on_path:
+                continue
+            if nodes >= max_nodes:
+                return SolveResult('unknown', [], nodes, perf_counter() - start)
+            nodes += 1
+            path.append(move)
+            on_path.add(key)
+            search.append((child, iter(ordered_moves(child))))
+            break
+        else:
+            # Every move from here has been searched
+            search.pop()
+            key = position_key(current)
+            on_path.discard(key)
+            dead_ends[key] = None
+            if len(dead_ends) > table_size:
+                for old_key in list(islice(dead_ends, len(dead_ends) // 2)):
+                    del dead_ends[old_key]
+            if path:
+                path.pop()
+    return SolveResult('lost', [], nodes, perf_counter() - start)
+
+
+# Solve a game (anything deal_cards accepts)
+def solve_game(cards, max_nodes = default_max_nodes, table_size = default_table_size):
+    return solve(initial_state(cards), max_nodes, table_size)
+
+
+# This worker's settings
+worker_max_nodes = default_max_nodes
+worker_table_size = default_table_size
+
+
+# Set up a worker, with the game settings to generate games with
+def start_worker(max_nodes = default_max_nodes, table_size = default_table_size,
+                 max_cards = None, extra_probability = None):
+    global worker_max_nodes, worker_table_size
+    worker_max_nodes = max_nodes
+    worker_table_size = table_size
+    if max_cards is not None:
+        game.max_cards = max_cards
+    if extra_probability is not None:
+        game.extra_probability = extra_probability
+
+
+# Solve random_game's game for each of a list of seeds, returning
+# (seed, outcome, positions searched, seconds, winning moves) for each
+def solve_seed_list(seeds):
+    results = []
+    for seed in seeds:
+        result = solve_game(game.random_game(False, Random(seed)),
+                            worker_max_nodes, worker_table_size)
+        results.append((seed, result.outcome, result.nodes, result.seconds, len(result.moves)))
+    return results
+
+
+# Solve the games for seeds first_seed up to (not including) last_seed over
+# workers processes, returning solve_seed_list's results in seed order
+def solve_seeds(first_seed, last_seed, workers = None, max_nodes = default_max_nodes,
+                table_size = default_table_size, max_cards = None, extra_probability = None,
+                chunk_size = default_chunk_size):
+    workers = workers or cpu_count() or 1
+    chunks = chunked(range(first_seed, last_seed), chunk_size)
+    worker_settings = (max_nodes, table_size, max_cards, extra_probability)
+    if workers == 1:
+        saved_settings = (game.max_cards, game.extra_probability)
+        start_worker(*worker_settings)
+        try:
+            results = [solve_seed_list(chunk) for chunk in chunks]
+        finally:
+            game.max_cards, game.extra_probability = saved_settings
+    else:
+        with ProcessPoolExecutor(workers, initializer = start_worker,
+                                 initargs = worker_settings) as executor:
+            results = list(executor.map(solve_seed_list, chunks))
+    return [result for chunk_results in results for result in chunk_results]
+
+
+# The value below which a fraction of the sorted values fall
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+# Win rate and solve time statistics for solve_seeds's results
+def summarise(results):
+    outcomes = {'won': 0, 'lost': 0, 'unknown': 0}
+    for seed, outcome, nodes, seconds, moves in results:
+        outcomes[outcome] += 1
+    games = len(results)
+    times = sorted(seconds for seed, outcome, nodes, seconds, moves in results)
+    solved_times = sorted(seconds for seed, outcome, nodes, seconds, moves in results
+                          if outcome != 'unknown')
+    summary = {'games': games, 'outcomes': outcomes,
+               'win_rate': outcomes['won'] / games if games else 0,
+               'decided_win_rate': (outcomes['won'] / (outcomes['won'] + outcomes['lost'])
+                                    if outcomes['won'] + outcomes['lost'] else 0),
+               'mean_nodes': sum(result[2] for result in results) / games if games else 0,
+               'mean_winning_moves': (sum(result[4] for result in results if result[1] == 'won') /
+                                      outcomes['won'] if outcomes['won'] else 0)}
+    for name, values in [('seconds', times), ('solved_seconds', solved_times)]:
+        summary[name] = {'p50': percentile(values, 0.5), 'p90': percentile(values, 0.9),
+                         'p99': percentile(values, 0.99), 'max': values[-1] if values else 0}
+    return summary
+
+
+def print_summary(summary):
+    outcomes = summary['outcomes']
+    print('%d games: %d won, %d lost, %d unknown' % (summary['games'], outcomes['won'],
+                                                     outcomes['lost'], outcomes['unknown']))
+    print('win rate %.1f%% (%.1f%% of the games decided)' %
+          (summary['win_rate'] * 100, summary['decided_win_rate'] * 100))
+    print('mean positions searched %.0f, mean winning moves %.1f' %
+          (summary['mean_nodes'], summary['mean_winning_moves']))
+    for name, label in [('seconds', 'all games'), ('solved_seconds', 'decided games')]:
+        times = summary[name]
+        print('solve ms (%s): p50 %.2f  p90 %.2f  p99 %.2f  max %.2f' %
+              (label, times['p50'] * 1000, times['p90'] * 1000, times['p99'] * 1000,
+               times['max'] * 1000))
+
+
+def main(arguments = None):
+    parser = ArgumentParser(description = "Solve random_game's games and report how many can be won.")
+    parser.add_argument('--seeds', default = '0:1000',
+                        help = "range of seeds for random_game (default '0:1000')")
+    parser.add_argument('--workers', type = int,
+                        help = 'worker processes (default one per core)')
+    parser.add_argument('--max-nodes', type = int, default = default_max_nodes,
+                        help = 'positions to search before giving up on a game (default 50000)')
+    parser.add_argument('--table-size', type = int, default = default_table_size,
+                        help = 'positions kept in the transposition table (default 200000)')
+    parser.add_argument('--max-cards', type = int,
+                        help = 'generate games with this max_cards (at most 14)')
+    parser.add_argument('--extra-probability', type = int,
+                        help = 'generate games with this extra_probability (percent)')
+    parser.add_argument('--output', help = 'also write the summary to this JSON file')
+    options = parser.parse_args(arguments)
+    if options.max_cards is not None and not 1 <= options.max_cards <= 14:
+        parser.error('--max-cards must be from 1 to 14')
+
+    first_seed, last_seed = parse_seed_range(options.seeds)
+    workers = options.workers or cpu_count() or 1
+    start = perf_counter()
+    results = solve_seeds(first_seed, last_seed, workers, options.max_nodes, options.table_size,
+                          options.max_cards, options.extra_probability)
+    seconds = perf_counter() - start
+    summary = summarise(results)
+    print_summary(summary)
+    print('%.2f s with %d workers' % (seconds, workers))
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            dump(summary, output_file, indent = 1)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,6 +1,12 @@
 from turtle import *
 from math import *
 from random import *
+from os import environ
+from contextlib import contextmanager
+from collections import namedtuple
+import turtle as turtle_module
+import random as random_module
+from solitaire_headless import HeadlessScreen, text_width
 
 # Define constant values used in the main program that sets up
 # the drawing canvas.
@@ -12,6 +18,127 @@ canvas_border = 30 # border between playing area and window's edge in pixels
 half_width = table_width // 2 # maximum x coordinate on table in either direction
 half_height = table_height // 2 # maximum y coordinate on table in either direction
 
+# Drawing backends
+#
+# All the drawing code below calls Turtle Graphics functions by name (forward,
+# circle, write, ...). use_backend rebinds those names, so the same code can
+# draw either in the normal Tk window ('tk') or onto a headless canvas held
+# in memory ('headless') that needs no display and can be saved as an image.
+# The backend can also be chosen with the SOLITAIRE_BACKEND environment
+# variable before the program is imported.
+
+# Turtle functions used by the drawing code
+turtle_functions = ['forward', 'back', 'left', 'right', 'goto', 'setheading',
+                    'home', 'circle', 'dot', 'stamp', 'write', 'undo',
+                    'penup', 'pendown', 'pensize', 'width', 'color',
+                    'pencolor', 'fillcolor', 'begin_fill', 'end_fill',
+                    'xcor', 'ycor', 'position', 'heading', 'turtlesize',
+                    'hideturtle', 'showturtle', 'speed', 'getscreen']
+# Screen functions used by the drawing code
+screen_functions = ['setup', 'tracer', 'bgcolor', 'title', 'update', 'done']
+
+active_backend = None
+
+def use_backend(backend = 'tk'):
+    global active_backend, culled_cards
+    if backend == 'tk':
+        bindings = {name: getattr(turtle_module, name)
+                    for name in turtle_functions + screen_functions}
+        bindings['circle'] = adaptive_circle(turtle_module.circle)
+    elif backend == 'headless':
+        bindings = headless_bindings(table_width + canvas_border * 2,
+                                     table_height + canvas_border * 2)
+    else:
+        raise ValueError('Unknown drawing backend: ' + repr(backend))
+    globals().update(bindings)
+    active_backend = backend
+    culled_cards = {} # the cut-short cards were on the old screen
+
+# Create a turtle on a new headless screen and return the bindings
+# that make the drawing functions use it
+def headless_bindings(width, height):
+    screen = HeadlessScreen(width, height)
+    pen = RawTurtle(screen)
+    # Don't let turtle's list of screens keep old headless canvases alive
+    RawTurtle.screens.remove(screen)
+    bindings = {name: getattr(pen, name) for name in turtle_functions}
+    bindings.update({name: getattr(screen, name) for name in screen_functions})
+    bindings['circle'] = adaptive_circle(pen.circle)
+    # Start hidden, like the main program's turtle
+    pen.hideturtle()
+    return bindings
+
+# Temporarily send all drawing to a turtle on a new headless screen, for
+# drawing something off screen. Gives the headless screen.
+@contextmanager
+def drawing_offscreen(width = table_width, height = table_height):
+    global culled_cards
+    saved_bindings = {name: globals()[name] for name in turtle_functions + screen_functions}
+    saved_culled_cards = culled_cards
+    globals().update(headless_bindings(width, height))
+    culled_cards = {}
+    try:
+        yield getscreen()
+    finally:
+        globals().update(saved_bindings)
+        culled_cards = saved_culled_cards
+
+# Save the current drawing to an image file. The headless backend can
+# write .png, .ppm or .svg files, the Tk window only PostScript (.eps/.ps).
+def save_drawing(filename):
+    screen = getscreen()
+    screen.update()
+    if active_backend == 'headless':
+        screen.cv.save(filename)
+    elif filename.lower().endswith(('.eps', '.ps')):
+        screen.cv.postscript(file = filename)
+    else:
+        raise ValueError('The Tk window can only be saved as PostScript: ' + filename)
+
+# Circle resolution
+#
+# The turtle draws a circle or arc as a number of straight steps. Left to
+# itself it picks the number from the radius in a way that gives a small
+# card's 5 pixel corners nearly as many steps per turn as a large fruit.
+# Instead, the backends' circle function chooses the steps so that no step
+# strays more than circle_tolerances[circle_quality] pixels from the true
+# arc (a step turning through an angle a on a circle of radius r strays
+# r * (1 - cos(a/2)) from it). Small arcs get few steps and big ones more,
+# whatever size the cards are. Passing steps to circle still uses exactly
+# that many.
+circle_quality = 'normal'
+circle_tolerances = {'low': 1.5, 'normal': 0.5, 'high': 0.1} # in pixels
+arc_vertex_cache = {}
+
+# Points along an arc drawn by circle(radius, extent) with the steps chosen
+# for a quality, from a turtle at (0, 0) heading east. Kept for each
+# (radius, extent, quality).
+def arc_vertices(radius, extent = 360, quality = None):
+    quality = quality or circle_quality
+    key = (radius, extent, quality)
+    if key not in arc_vertex_cache:
+        tolerance = circle_tolerances[quality]
+        if abs(radius) <= tolerance:
+            step_angle = pi
+        else:
+            step_angle = 2 * acos(1 - tolerance / abs(radius))
+        steps = max(1, ceil(radians(abs(extent)) / step_angle))
+        vertices = [(0.0, 0.0)]
+        for step in range(1, steps + 1):
+            vertices.append(path_end(0, 0, [('circle', radius, extent * step / steps)]))
+        arc_vertex_cache[key] = vertices
+    return arc_vertex_cache[key]
+
+# Wrap a backend's circle function so that it uses arc_vertices' steps
+def adaptive_circle(turtle_circle):
+    def circle(radius, extent = None, steps = None):
+        if steps is None:
+            steps = len(arc_vertices(radius, 360 if extent is None else extent)) - 1
+        return turtle_circle(radius, extent, steps)
+    return circle
+
+use_backend(environ.get('SOLITAIRE_BACKEND', 'tk'))
+
 # Work out how wide some text is (in pixels)
 def calculate_text_width(string, text_font = None):
     penup()
@@ -27,7 +154,9 @@ def calculate_text_width(string, text_font = None):
 axis_font = ('Consolas', 10, 'normal') # font for drawing the axes
 font_height = 14 # interline separation for text
 tic_sep = 50 # gradations for the x and y scales shown on the screen
-tics_width = calculate_text_width("-mmm -", axis_font) # width of y axis labels
+# Width of y axis labels, estimated from a table of font metrics rather
+# than by writing and measuring the text, which would need a window
+tics_width = int(text_width("-mmm -", axis_font))
 
 # Constants defining the stacks of cards
 stack_base = half_height - 25 # starting y coordinate for the stacks
@@ -57,6 +186,9 @@ def create_drawing_canvas(show_axes: object = True) -> object:
 
     :rtype: object
     """
+    # Hide turtle as it appears when canvas and coordinates are set to 'False'
+    hideturtle()
+
     # Set up the drawing canvas
     setup(table_width + tics_width + canvas_border * 2,
           table_height + font_height + canvas_border * 2)
@@ -117,6 +249,11 @@ def create_drawing_canvas(show_axes: object = True) -> object:
     width(1)
     penup()
     home()
+
+    # Tag everything drawn so far as the background, so that new deals can
+    # clear the cards and leave it in place
+    update()
+    getscreen().cv.addtag_withtag('background', 'all')
     tracer(True)
 
 
@@ -199,46 +336,61 @@ fixed_game_17 = \
  
 # The "full_game" dataset describes a random game
 # containing the maximum number of cards
-stacks = ['Stack ' + str(stack_num+1) for stack_num in range(num_stacks)]
-shuffle(stacks)
-suits = ['Suit ' + chr(ord('A')+suit_num) for suit_num in range(4)]
-shuffle(suits)
-full_game = [[stacks[stack], suits[stack % 4], max_cards, randint(0, max_cards)]
-             for stack in range(num_stacks)]
+# (using its own random numbers, so importing the program doesn't disturb
+# the sequence random_game sees)
+def make_full_game(rng):
+    stacks = ['Stack ' + str(stack_num+1) for stack_num in range(num_stacks)]
+    rng.shuffle(stacks)
+    suits = ['Suit ' + chr(ord('A')+suit_num) for suit_num in range(4)]
+    rng.shuffle(suits)
+    return [[stacks[stack], suits[stack % 4], max_cards, rng.randint(0, max_cards)]
+            for stack in range(num_stacks)]
+
+full_game = make_full_game(Random())
 
 #
 #--------------------------------------------------------------------#
 
-def random_game(print_game = True):
+# Percent chance of the extra value being non-zero
+extra_probability = 20
 
-    # Percent chance of the extra value being non-zero
-    extra_probability = 20
+# How many suits random games are dealt from ('Suit A' onwards), so suits
+# registered later for themes don't change the games
+num_random_suits = 4
+
+# Generate a random game. The random numbers come from the random module
+# unless another random number generator (e.g. random.Random(seed)) is
+# given as rng, for games that can be generated again from the same seed.
+def random_game(print_game = True, rng = None):
+
+    if rng is None:
+        rng = random_module
 
     # Generate all the stack and suit names playable
     game_stacks = ['Stack ' + str(stack_num+1)
                    for stack_num in range(num_stacks)]
     game_suits = ['Suit ' + chr(ord('A')+suit_num)
-                  for suit_num in range(4)]
+                  for suit_num in range(num_random_suits)]
 
     # Create a list of stack specifications
     game = []
 
     # Randomly order the stacks
-    shuffle(game_stacks)
+    rng.shuffle(game_stacks)
 
     # Create the individual stack specifications 
     for stack in game_stacks:
         # Choose the suit and number of cards
-        suit = choice(game_suits)
-        num_cards = randint(0, max_cards)
+        suit = rng.choice(game_suits)
+        num_cards = rng.randint(0, max_cards)
         # Choose the extra value
-        if num_cards > 0 and randint(1, 100) <= extra_probability: 
-            option = randint(1,num_cards)
+        if num_cards > 0 and rng.randint(1, 100) <= extra_probability: 
+            option = rng.randint(1,num_cards)
         else:
             option = 0
         # Add the stack to the game, but if the number of cards
         # is zero we will usually choose to omit it entirely
-        if num_cards != 0 or randint(1, 4) == 4:
+        if num_cards != 0 or rng.randint(1, 4) == 4:
             game.append([stack, suit, num_cards, option])
         
     # Optionally print the result to the shell window
@@ -252,8 +404,6 @@ def random_game(print_game = True):
 
 
 # Game design:
-# Hide turtle as it appears when canvas and coordinates are set to 'False'
-hideturtle()
 
 # Set locations for starting point of cards (top left side of card for start point),
 # these are the ones set on program drawing but -75 on x axis.
@@ -269,6 +419,9 @@ card_height = (size*20)
 radius = (size/2)
 angle = 180
 length = size
+covered_card_height = (length*6) + (radius*2) # visible part of a card with another dealt on top
+identifier_font = ('Arial', (int(length*1.8))) # font for card numbers/ids
+artwork_version = 2 # bump whenever the card drawings change, so stored images of them are redrawn
 
 
 
@@ -302,477 +455,941 @@ length = size
 
 
 # Write definition for card identifier(letter/number) on top left of card and bottom right of card.
+# Each label is written once, as one text item straight onto the canvas
+# (which is all turtle's write does, apart from measuring the text
+# afterwards), so a card has exactly one text item in each corner.
+# The labels are card_labels, if set (draw_plan sets them from each card's
+# placement), and otherwise worked out from the turtle's position.
+card_labels = None
+
 def card_identifier():
-    # Following is to draw card number/id on top left side of card:
     x_number = (xcor())
     y_number = (ycor())
-    # Move position ready to write card number:
-    goto(xcor() + ((length/10)*7), ycor() + (length*2.4))
-    pendown()
-    for draw_number in range(max_cards):
-        write(int(ycor()/10), font=('Arial', (int(length*1.8))))
-        penup()
+    tk_canvas = getscreen().cv
+    top_label, bottom_label = card_labels or identifier_labels(y_number)
+    # Following is to draw card number/id on top left side of card:
+    x_top = x_number + ((length/10)*7)
+    y_top = y_number + (length*2.4)
+    tk_canvas.create_text(x_top - 1, -y_top, text = top_label, anchor = 'sw',
+                          fill = pencolor(), font = identifier_font, tags = card_tags)
+    # Following is to draw card number/id on bottom right side of card,
+    # unless it is hidden under the next card:
+    x_bottom = x_top + (length*10.5)
+    y_bottom = y_top - (length*15.5)
+    card_top = y_number + (length*6)
+    if visible_card_height is not None and card_top - y_bottom > visible_card_height:
+        return
+    tk_canvas.create_text(x_bottom, -y_bottom, text = bottom_label,
+                          angle = 180, fill = pencolor(), font = identifier_font, tags = card_tags)
+
+# The card numbers/ids for a card drawn from y_number (the card's top less
+# length*6), top left then bottom right, when none are given
+def identifier_labels(y_number):
+    y_top = y_number + (length*2.4)
+    return str(int(y_top/10)), str(int(y_number/10)+int(length/5))
+
+# Check that every suit's cards have exactly one text item in each corner,
+# or just the top left one on a card covered by the next card in its stack
+# (when cull_hidden_cards is set), by dealing a stack of each suit off
+# screen and counting each card's text items
+def check_card_identifiers(stack_size = 3):
+    for suit in suit_names:
+        with drawing_offscreen() as screen:
+            tracer(False)
+            deal_cards([['Stack 1', suit, stack_size, 0]])
+            for card_number in range(1, stack_size + 1):
+                text_items = sum(1 for item in screen.cv.find_withtag(card_tag('Stack 1', card_number))
+                                 if screen.cv.type(item) == 'text')
+                covered = cull_hidden_cards and card_number < stack_size
+                expected = 1 if covered else 2
+                if text_items != expected:
+                    raise AssertionError(suit + ' card ' + str(card_number) + ' of ' +
+                                         str(stack_size) + ' has ' + str(text_items) +
+                                         ' text items, expected ' + str(expected))
+
+# Seeds
+#
+# The watermelon and strawberry cards are sprinkled with seeds, each one a
+# copy of turtle's "classic" arrow shape pointing away from a common
+# origin. Rather than walking the turtle out to every seed and stamping it,
+# all the seed positions for a card are worked out in one go and the seed
+# shapes are put straight onto the canvas.
+#
+# Stamping every seed leaves a separate canvas item behind for each one.
+# With merge_seeds set, the seeds of a card are joined into a few polygon
+# items instead: each seed is reached along a "spoke" from a hub point and
+# the path comes back the same way, so the spokes enclose no area and
+# aren't filled. The merged polygons have no outline (it would draw the
+# spokes), so their seeds are grown by half a pixel to make up for it.
+# Polygons are filled by the even-odd rule, so two overlapping seeds in one
+# polygon would cancel out (and a seed laid twice would vanish); a seed
+# that overlaps one already in a polygon goes into another, so the card
+# looks just as it does with the seeds stamped.
+seeds_per_card = 50
+seed_shape = ((0, 0), (-5, -9), (0, -7), (5, -9)) # turtle's "classic" shape
+merge_seeds = True
+
+# Random numbers for the artwork, kept apart from the game's random numbers
+artwork_random = Random()
+
+# Follow turtle moves from (x, y), heading 0, without drawing anything and
+# return where they end. Moves are ('forward', distance),
+# ('left', angle), ('right', angle) or ('circle', radius, extent).
+def path_end(x, y, moves):
+    heading = 0
+    for move in moves:
+        if move[0] == 'forward':
+            x += move[1] * cos(radians(heading))
+            y += move[1] * sin(radians(heading))
+        elif move[0] == 'left':
+            heading += move[1]
+        elif move[0] == 'right':
+            heading -= move[1]
+        else:
+            circle_radius, extent = move[1], move[2]
+            turn = extent if circle_radius > 0 else -extent
+            # Rotate around the centre, which is circle_radius to the left
+            x_centre = x - circle_radius * sin(radians(heading))
+            y_centre = y + circle_radius * cos(radians(heading))
+            x_offset, y_offset = x - x_centre, y - y_centre
+            x = x_centre + x_offset * cos(radians(turn)) - y_offset * sin(radians(turn))
+            y = y_centre + x_offset * sin(radians(turn)) + y_offset * cos(radians(turn))
+            heading += turn
+    return x, y
+
+# Scatter seeds_per_card seeds out from (x, y) with headings and distances
+# chosen at random from the given ranges. Returns (x, y, heading) for
+# each seed.
+def seed_layout(x, y, heading_range, distance_range):
+    randint = artwork_random.randint
+    low_heading, high_heading = sorted(int(value) for value in heading_range)
+    low_distance, high_distance = sorted(int(value) for value in distance_range)
+    headings = [randint(low_heading, high_heading) for seed in range(seeds_per_card)]
+    distances = [randint(low_distance, high_distance) for seed in range(seeds_per_card)]
+    return [(x + distance * cos(radians(heading)), y + distance * sin(radians(heading)), heading)
+            for heading, distance in zip(headings, distances)]
+
+# Put a seed at each (x, y, heading), in the pen colour, the same way
+# turtle would stamp its "classic" shape stretched by turtlesize
+def stamp_seeds(seeds, stretch_width, stretch_length):
+    shape = [(x_shape * stretch_width, y_shape * stretch_length) for x_shape, y_shape in seed_shape]
+    if merge_seeds:
+        # Grow the shape by half a pixel around its centre
+        x_centre = sum(x_shape for x_shape, y_shape in shape) / len(shape)
+        y_centre = sum(y_shape for x_shape, y_shape in shape) / len(shape)
+        shape = [(x_shape + 0.5 * (x_shape - x_centre) / hypot(x_shape - x_centre, y_shape - y_centre),
+                  y_shape + 0.5 * (y_shape - y_centre) / hypot(x_shape - x_centre, y_shape - y_centre))
+                 for x_shape, y_shape in shape]
+    seed_colour = pencolor()
+    tk_canvas = getscreen().cv
+    merged = [] # (polygon coordinates, bounding boxes of its seeds)
+    for x, y, heading in seeds:
+        cos_heading, sin_heading = cos(radians(heading)), sin(radians(heading))
+        coordinates = []
+        for x_shape, y_shape in shape:
+            coordinates.append(x + sin_heading * x_shape + cos_heading * y_shape)
+            coordinates.append(-(y - cos_heading * x_shape + sin_heading * y_shape))
+        if not merge_seeds:
+            tk_canvas.create_polygon(coordinates, fill = seed_colour, outline = seed_colour, width = 1)
+            continue
+        box = (min(coordinates[0::2]), min(coordinates[1::2]),
+               max(coordinates[0::2]), max(coordinates[1::2]))
+        for polygon, boxes in merged:
+            if not any(box[0] <= other[2] and other[0] <= box[2] and
+                       box[1] <= other[3] and other[1] <= box[3] for other in boxes):
+                break
+        else:
+            polygon, boxes = [], []
+            merged.append((polygon, boxes))
+        # Out along the spoke, round the seed and back again
+        polygon.extend(coordinates + coordinates[:2] + polygon[:2])
+        boxes.append(box)
+    for polygon, boxes in merged:
+        tk_canvas.create_polygon(polygon, fill = seed_colour, outline = '')
+
+# Count the canvas items that dealing a game creates, by item type, on a
+# fresh headless canvas with the current settings
+def deal_item_counts(game):
+    with drawing_offscreen() as screen:
+        tracer(False)
+        items_before = set(screen.cv.find_all())
+        deal_cards(game)
+        update()
+        counts = {}
+        for item in screen.cv.find_all():
+            if item not in items_before:
+                item_type = screen.cv.type(item)
+                counts[item_type] = counts.get(item_type, 0) + 1
+    return counts
+
+# Report how many canvas items a deal creates with one item per seed and
+# with the seeds of each card merged into polygons
+def report_seed_items(game, print_report = True):
+    global merge_seeds
+    saved_setting = merge_seeds
+    report = {}
+    try:
+        for merge_seeds in (False, True):
+            report['merged' if merge_seeds else 'stamped'] = deal_item_counts(game)
+    finally:
+        merge_seeds = saved_setting
+    if print_report:
+        for mode, counts in report.items():
+            print('Seeds ' + mode + ': ' + str(sum(counts.values())) + ' canvas items ' +
+                  str(dict(sorted(counts.items()))))
+    return report
+
+# Fixed paths
+#
+# The card outline and the strawberry and avocado bodies are the same
+# shape on every card of a given size. Rather than steering the turtle
+# round them a step at a time, each shape is worked out once as a list of
+# points by trace_path, kept in path_cache, and drawn by fill_path as a
+# single filled and outlined polygon.
+path_cache = {}
+
+# Moves tracing the rounded outline of a card from its top left corner
+def card_outline_moves():
+    return [('forward', card_width), ('circle', -radius, angle/2),
+            ('forward', card_height), ('circle', -radius, angle/2)] * 2
+
+# Moves tracing the strawberry, from the top left of the fruit
+def strawberry_fruit_moves():
+    return [('forward', length*4), ('circle', -(length*2), (angle/18)*11),
+            ('forward', length*8), ('circle', -(length*2), (angle/9)*7),
+            ('forward', length*8), ('circle', -(length*2), (angle/18)*11),
+            ('forward', length*4)]
+
+# Moves tracing the avocado's skin and the fruit inside it
+def avocado_skin_moves():
+    return [('circle', -(length*4.8), -(angle/18)*19), ('forward', -(length*9.6)),
+            ('circle', -(length*2.4), -(angle/18)*15.3), ('forward', -(length*11.2))]
+
+def avocado_fruit_moves():
+    return [('circle', (-(length*5.7))*.8, -((angle/18)*19)), ('forward', (-(length*11.4))*.8),
+            ('circle', (-(length*2.85))*.8, -((angle/18)*15.3)), ('forward', (-(length*13.3))*.8)]
+
+# Follow turtle moves (as for path_end) from (0, 0) heading east, with
+# circles in the steps arc_vertices gives them. Returns the points passed
+# through and the total turn.
+def trace_path(moves):
+    x = y = heading = 0
+    points = [(0, 0)]
+    for move in moves:
+        if move[0] == 'forward':
+            x += move[1] * cos(radians(heading))
+            y += move[1] * sin(radians(heading))
+            points.append((x, y))
+        elif move[0] == 'left':
+            heading += move[1]
+        elif move[0] == 'right':
+            heading -= move[1]
+        else:
+            circle_radius, extent = move[1], move[2]
+            x_step, y_step = cos(radians(heading)), sin(radians(heading))
+            for x_arc, y_arc in arc_vertices(circle_radius, extent)[1:]:
+                points.append((x + x_arc * x_step - y_arc * y_step,
+                               y + x_arc * y_step + y_arc * x_step))
+            x, y = points[-1]
+            heading += extent if circle_radius > 0 else -extent
+    return points, heading
+
+# The traced path for a moves function at the current size. Paths are kept
+# by the function itself, not its name, so moves functions made by the same
+# factory (with the same name) each get their own path.
+def fixed_path(moves):
+    key = (moves, size, circle_quality)
+    if key not in path_cache:
+        path_cache[key] = trace_path(moves())
+    return path_cache[key]
+
+# Draw a traced path from the turtle's position and heading as one polygon,
+# filled and outlined in the given colours (by default the turtle's),
+# leaving the turtle (pen up) where it would be if it had followed the
+# path itself
+def fill_path(path, outline = None, fill = None):
+    points, turn = path
+    x_start, y_start, start_heading = xcor(), ycor(), heading()
+    x_step, y_step = cos(radians(start_heading)), sin(radians(start_heading))
+    placed = [(x_start + x * x_step - y * y_step, y_start + x * y_step + y * x_step)
+              for x, y in points]
+    getscreen().cv.create_polygon([value for x, y in placed for value in (x, -y)],
+                                  fill = fillcolor() if fill is None else fill,
+                                  outline = pencolor() if outline is None else outline,
+                                  width = pensize(), tags = card_tags)
+    penup()
+    goto(placed[-1])
+    setheading(start_heading + turn)
 
-    # Following is to draw card number/id on bottom right side of card:
-    # Move position ready to write card number:
-    goto(xcor() + (length*10.5), ycor() - (length*15.5))
-    pendown()
-    for draw_number in range(max_cards):
-        write_upside_down((int(y_number/10)+int(length/5)), font=('Arial', (int(length*1.8))))
+# Card sprites
+#
+# Every card of a suit looks the same apart from its card number/id, so
+# each suit's artwork is drawn only once, by a turtle on a private headless
+# canvas, and kept as a list of canvas items keyed by (artwork function, size,
+# seed, circle and detail settings).
+# Placing a card then just copies those items onto the real canvas at the
+# card's position, instead of tracing the whole drawing again.
+# Set use_sprite_cache to False to have the turtle trace every card afresh
+# (still off screen, so each card's items can be tagged the same way).
+use_sprite_cache = True
+sprite_cache = {}
+
+# Options worth copying from each kind of canvas item
+sprite_options = {'polygon': ('fill', 'outline', 'width'),
+                  'line': ('fill', 'width', 'capstyle')}
+
+# Draw an artwork function with a turtle on a headless canvas and return
+# its items as (item type, coordinates, options), relative to the card's
+# top left corner
+def trace_artwork(artwork):
+    with drawing_offscreen() as screen:
+        tracer(False)
+        penup()
+        draw_shapes(artwork())
+        update()
+    return [(item_type, tuple(coordinates),
+             {option: settings[option] for option in sprite_options[item_type]})
+            for item_type, coordinates, settings in screen.cv.visible_items()]
+
+# Trace an artwork function once and keep the result. With a
+# visible_height, only the top visible_height pixels of the card are kept.
+# Sprites are kept by the artwork function itself, not its name, so suits
+# whose artwork comes from the same factory (e.g. themes in different
+# colours) each get their own sprite.
+def compile_sprite(artwork, visible_height = None):
+    settings = (size, merge_seeds, circle_quality, detail_level)
+    key = (artwork,) + settings
+    if key not in sprite_cache:
+        # Give the sprite the same seeds every time it is compiled (in
+        # every run, so from the name rather than the function)
+        artwork_state = artwork_random.getstate()
+        artwork_random.seed(repr((artwork.__name__,) + settings))
+        try:
+            sprite_cache[key] = trace_artwork(artwork)
+        finally:
+            artwork_random.setstate(artwork_state)
+    if visible_height is None:
+        return sprite_cache[key]
+    clipped_key = key + (visible_height,)
+    if clipped_key not in sprite_cache:
+        sprite_cache[clipped_key] = clip_sprite(sprite_cache[key], visible_height)
+    return sprite_cache[clipped_key]
+
+# Cut a sprite down to the part within visible_height of the card's top
+def clip_sprite(sprite, visible_height):
+    clipped = []
+    for item_type, coordinates, options in sprite:
+        points = list(zip(coordinates[0::2], coordinates[1::2]))
+        if item_type == 'polygon':
+            points = clip_polygon(points, visible_height)
+        else:
+            points = clip_polyline(points, visible_height)
+        # Leave out items that are hidden altogether
+        if len(points) >= (3 if item_type == 'polygon' else 2):
+            clipped.append((item_type, tuple(value for point in points for value in point),
+                            options))
+    return clipped
+
+# Clip a polygon to the points no lower than limit (canvas y points down)
+def clip_polygon(points, limit):
+    clipped = []
+    for (x_start, y_start), (x_end, y_end) in zip(points, points[1:] + points[:1]):
+        if y_start <= limit:
+            clipped.append((x_start, y_start))
+        if (y_start <= limit) != (y_end <= limit):
+            fraction = (limit - y_start) / (y_end - y_start)
+            clipped.append((x_start + fraction * (x_end - x_start), limit))
+    return clipped
+
+# Clip a polyline the same way. Where the line dips below the limit and
+# comes back, the two ends are joined along the limit, which is hidden
+# under the next card, so the line stays one item.
+def clip_polyline(points, limit):
+    clipped = []
+    for (x_start, y_start), (x_end, y_end) in zip(points, points[1:]):
+        if y_start <= limit and not clipped:
+            clipped.append((x_start, y_start))
+        if (y_start <= limit) != (y_end <= limit):
+            fraction = (limit - y_start) / (y_end - y_start)
+            clipped.append((x_start + fraction * (x_end - x_start), limit))
+        if y_end <= limit:
+            clipped.append((x_end, y_end))
+    return clipped
+
+# Copy a sprite onto the canvas with its top left corner at (x, y),
+# giving its items the current card_tags
+def place_sprite(sprite, x, y):
+    tk_canvas = getscreen().cv
+    create = {'polygon': tk_canvas.create_polygon, 'line': tk_canvas.create_line}
+    for item_type, coordinates, options in sprite:
+        create[item_type](*[value + (x if index % 2 == 0 else -y)
+                            for index, value in enumerate(coordinates)],
+                          tags = card_tags, **options)
+
+# Draw a card's artwork at the turtle's position (only the part that
+# will be seen, when visible_card_height is set)
+def draw_artwork(artwork):
+    if use_sprite_cache:
+        sprite = compile_sprite(artwork, visible_card_height)
+    elif visible_card_height is not None:
+        sprite = clip_sprite(trace_artwork(artwork), visible_card_height)
+    else:
+        sprite = trace_artwork(artwork)
+    place_sprite(sprite, xcor(), ycor())
+
+# Occlusion culling
+#
+# Within a stack each card is dealt a little lower than the one before and
+# on top of it, so only a strip along the top of each lower card can be
+# seen. With cull_hidden_cards set, deal_cards tells the drawing code how
+# much of each card will show (visible_card_height, None for the top card
+# of a stack), and the covered cards are drawn only that far down, with
+# just their top card number/id.
+#
+# A covered card is only cut short while the card over it stays put. When
+# a single card is moved, raised or deleted with move_cards, raise_cards or
+# delete_cards, it and the card under it are first drawn whole again by
+# reveal_card, where they are now and in their places in the drawing
+# order, so nothing is left showing as a strip.
+cull_hidden_cards = True
+visible_card_height = None
+# Tag of a card drawn cut short -> (its placement, moved along with the
+# card by move_cards, and detail level)
+culled_cards = {}
+
+# Draw the cut-short card with a tag, and the one under it, whole again
+def reveal_card(tag):
+    stack_number, separator, card_number = tag.rpartition('_card_')
+    if not separator or not card_number.isdigit():
+        return # not a single card
+    tk_canvas = getscreen().cv
+    for number in (int(card_number), int(card_number) - 1):
+        culled_tag = stack_number + '_card_' + str(number)
+        if culled_tag not in culled_cards:
+            continue
+        placement, detail = culled_cards.pop(culled_tag)
+        if not tk_canvas.find_withtag(culled_tag):
+            continue # deleted since it was drawn
+        tk_canvas.delete(culled_tag)
+        draw_plan([placement._replace(visible_height = None)], detail)
+        # Back under the card that covered it
+        covering_tag = stack_number + '_card_' + str(number + 1)
+        if tk_canvas.find_withtag(covering_tag):
+            tk_canvas.tag_lower(culled_tag, covering_tag)
+
+# Tagged cards
+#
+# Each card's canvas items share tags, so a card or a whole stack can be
+# moved, raised or deleted with a single canvas call instead of being
+# redrawn. Every card item is tagged 'card', plus its stack (e.g.
+# 'stack_3') and the card itself (e.g. 'stack_3_card_2', counting from 1
+# at the back of the stack). deal_cards sets card_tags for each card it
+# draws; cards drawn outside deal_cards are just tagged 'card'.
+card_tags = ('card',)
+
+# Tag of a stack, from its name ('Stack 3' -> 'stack_3')
+def stack_tag(stack_name):
+    return stack_name.lower().replace(' ', '_')
+
+# Tag of one card in a stack
+def card_tag(stack_name, card_number):
+    return stack_tag(stack_name) + '_card_' + str(card_number)
+
+# Move every card item with a tag (one card, one stack, or 'card' for all
+# of them) by the given distances in turtle coordinates
+def move_cards(tag, x_distance, y_distance):
+    reveal_card(tag)
+    getscreen().cv.move(tag, x_distance, -y_distance)
+    for culled_tag, (placement, detail) in culled_cards.items():
+        if tag in placement_tags(placement):
+            culled_cards[culled_tag] = (placement._replace(x = placement.x + x_distance,
+                                                           y = placement.y + y_distance), detail)
+
+# Bring the tagged cards to the front
+def raise_cards(tag):
+    reveal_card(tag)
+    getscreen().cv.tag_raise(tag)
+
+# Remove the tagged cards from the table
+def delete_cards(tag):
+    if tag == 'card':
+        culled_cards.clear()
+    else:
+        reveal_card(tag)
+    getscreen().cv.delete(tag)
+
+# Suit registry
+#
+# Each kind of card is described by an artwork function that returns its
+# drawing as data: a list of shapes, in drawing order, worked out for the
+# current card size. A shape is a dictionary with
+#   'path'     turtle moves (as for path_end), or a function returning them,
+#              drawn as one polygon by fill_path
+#   'pen'      outline colour ('' for none)
+#   'fill'     fill colour
+#   'at'       where the shape starts, relative to the card's top left
+#              corner (left out to carry on from where the last shape ended)
+#   'heading'  the turtle's heading at the start (default 0)
+# or, for a spray of seeds (see seed_layout and stamp_seeds),
+#   'seeds'    the point the seeds are scattered from, relative to the
+#              card's top left corner
+#   'headings', 'distances', 'stretch', 'colour'
+# Seeds, and shapes marked 'detail': True, are left out of the simplified
+# artwork drawn when the table is crowded (see Level of detail below).
+#
+# draw_shapes follows the list with the turtle, and the sprite cache keeps
+# the result for each card size, so an artwork is only worked through once
+# and every card after that is copied from its sprite.
+#
+# The fruit suits are registered with register_suit under their suit names
+# ('Suit A' ...). A new suit needs just an artwork function and a call to
+# register_suit, after which deal_cards can deal it like the others.
+suit_registry = {} # suit name -> artwork function
+suit_names = [] # registered suits, in order
+suit_indices = {} # suit name -> index in suit_names
+suit_drawers = [] # by suit index, the function that draws one card
+
+def register_suit(suit_name, artwork, drawer = None):
+    if suit_name not in suit_indices:
+        suit_indices[suit_name] = len(suit_names)
+        suit_names.append(suit_name)
+        suit_drawers.append(None)
+    suit_registry[suit_name] = artwork
+    suit_drawers[suit_indices[suit_name]] = drawer or (lambda: draw_suit(suit_name))
+
+# Draw a list of shapes from a card's top left corner at the turtle's position
+def draw_shapes(shapes):
+    x_card, y_card = xcor(), ycor()
+    simplified = detail_level == 'simple'
+    for shape in shapes:
         penup()
-    # Return to card_identifier start point:
-    goto(x_number, y_number)
+        if 'seeds' in shape:
+            if simplified:
+                continue
+            color(shape.get('colour', 'black'))
+            x_offset, y_offset = shape['seeds']
+            seeds = seed_layout(x_card + x_offset, y_card + y_offset,
+                                shape['headings'], shape['distances'])
+            stamp_seeds(seeds, *shape['stretch'])
+            continue
+        if 'at' in shape:
+            goto(x_card + shape['at'][0], y_card + shape['at'][1])
+            setheading(shape.get('heading', 0))
+        moves = shape['path']
+        path = fixed_path(moves) if callable(moves) else trace_path(moves)
+        if simplified and shape.get('detail'):
+            # Skip the shape, but end up where drawing it would have left
+            # the turtle, for the shapes that carry on from it
+            points, turn = path
+            x_start, y_start = xcor(), ycor()
+            x_step, y_step = cos(radians(heading())), sin(radians(heading()))
+            x_end, y_end = points[-1]
+            goto(x_start + x_end * x_step - y_end * y_step, y_start + x_end * y_step + y_end * x_step)
+            setheading(heading() + turn)
+            continue
+        fill_path(path, shape['pen'], shape['fill'])
+
+# Level of detail
+#
+# When the cards are small or there are a lot of them, the finer parts of
+# the artwork (seeds, leaves, stems and so on) can hardly be seen but
+# still cost time to draw. deal_cards deals with simplified artwork, just
+# the card and the fruit's outline, if the card size is below
+# lod_min_size or the game has more than lod_card_budget cards. Set either
+# to None to never simplify for that reason.
+lod_min_size = 6
+lod_card_budget = 100
+detail_level = 'full' # 'full' or 'simple', set by deal_cards for each deal
+
+# The detail level to deal a render plan (see plan_deal) at
+def choose_detail_level(plan):
+    if lod_min_size is not None and size < lod_min_size:
+        return 'simple'
+    if lod_card_budget is not None and len(plan) > lod_card_budget:
+        return 'simple'
+    return 'full'
+
+# Draw one card of a registered suit at the turtle's position, with its
+# card number/id, and go to where the next card in the stack starts
+def draw_suit(suit_name):
+    x_card_point = (xcor())
+    y_card_point = (ycor() - (length*6))
+    draw_artwork(suit_registry[suit_name])
+    goto(x_card_point, y_card_point)
+    # Draw card number/id and go back to the next card's starting point
+    card_identifier()
+    goto(x_card_point, y_card_point)
 
 # Set up and define card drawings:
 # Suit_1 is for the orange card.
 def Suit_1():
-    color("black", "white")
-    pendown()
-    begin_fill()
-    x_orange_point = (xcor())
-    y_orange_point = (ycor() - (length*6))
-    setheading(0)
-    # Draw card
-    for draw_card in range(2):
-        forward(card_width)
-        circle(-radius, angle/2)
-        forward(card_height)
-        circle(-radius, angle/2)
-    penup()
-    end_fill()
-    setheading(0)
-    forward(card_width/2)
-    right(angle/2)
-    forward(card_height/3)
-    setheading(0)
-    x_orange = (xcor())
-    y_orange = (ycor())
-    right(angle/2)
-    forward(length*5)
-    setheading(0)
-
-    # Define and draw orange fruit
-    def orange_fruit():
-        goto(x_orange, y_orange + (length*2))
-        pendown()
-        color("black", "orange")
-        begin_fill()
-        circle(-radius*11, angle*2)
-        end_fill()
-        penup()
-        right(angle/2)
-        forward(length*5)
-        setheading(0)
-
-    # Define and draw leaves
-    def orange_leaves():
-        goto(x_orange, y_orange + (length*2))
-        color("black", "green")
-        begin_fill()
-        circle(radius*9, - angle/4)
-        right((angle/3)*2)
-        circle(radius*9, - angle/4)
-        left(angle/3)
-        circle(radius*9, - angle/4)
-        right((angle/3) *2)
-        circle(radius*9, - angle/4)
-        end_fill()
-    orange_fruit()
-    orange_leaves()
-    penup()
-    goto(x_orange_point, y_orange_point)
-    # Draw card number/id and got to start Suit_1 starting point
-    card_identifier()
-    goto(x_orange_point, y_orange_point)
+    draw_suit('Suit A')
+
+# Artwork for the orange card
+def orange_artwork():
+    # Orange starting point
+    x_orange = card_width/2
+    y_orange = -card_height/3
+    return [
+        # Card
+        {'path': card_outline_moves, 'pen': 'black', 'fill': 'white', 'at': (0, 0)},
+        # Orange fruit
+        {'path': [('circle', -radius*11, angle*2)], 'pen': 'black', 'fill': 'orange',
+         'at': (x_orange, y_orange + (length*2))},
+        # Leaves
+        {'path': [('circle', radius*9, - angle/4), ('right', (angle/3)*2),
+                  ('circle', radius*9, - angle/4), ('left', angle/3),
+                  ('circle', radius*9, - angle/4), ('right', (angle/3) *2),
+                  ('circle', radius*9, - angle/4)],
+         'pen': '', 'fill': 'green', 'at': (x_orange, y_orange + (length*2)), 'detail': True}]
 
 # Suit_2 is for watermelon card
 def Suit_2():
-    color("black", "white")
-    pendown()
-    begin_fill()
-    x_watermelon_point = (xcor())
-    y_watermelon_point = (ycor() - (length*6))
-    setheading(0)
-    pendown()
-    # Draw card
-    for draw_card in range(2):
-        forward(card_width)
-        circle(-radius, angle/2)
-        forward(card_height)
-        circle(-radius, angle/2)
-    penup()
-    end_fill()
-    setheading(0)
-    forward(card_width/3)
-    right(angle/2)
-    forward(card_height/2)
-    setheading(0)
-    x_watermelon = (xcor())
-    y_watermelon = (ycor())
-
-    def watermelon_skin():
-        # Draw watermelon skin
-        goto(x_watermelon, y_watermelon)
-        color("black", "green")
-        begin_fill()
-        pendown()
-        left((angle/18)*7)
-        forward((length*7.5))
-        right(angle/2)
-        circle(-(length*7.5), angle)
-        right(angle/2)
-        forward((length*7.5))
-        end_fill()
-        penup()
-
-    def watermelon_fruit():
-        # Draw watermelon fruit(the red part)
-        color("black", "orange red")
-        begin_fill()
-        pendown()
-        forward(length*6.5)
-        right(angle/2)
-        circle(-(length*6.5), angle)
-        right(angle/2)
-        forward(length*6.5)
-        end_fill()
-        penup()
-
-    def watermelon_seeds():
-        # Draw watermelon seeds
-        color("black")
-        turtlesize((length/100), (length/40))
-        for seeds in range(50):
-            goto(x_watermelon, y_watermelon)
-            setheading(randint(-(length*11), (angle/18)*7))
-            forward(randint((length*1.5), angle/3))
-            stamp()
-    watermelon_skin()
-    watermelon_fruit()
-    watermelon_seeds()
-    goto(x_watermelon_point, y_watermelon_point)
-    #Draw card number/id and got to start Suit_2 starting point
-    card_identifier()
-    goto(x_watermelon_point, y_watermelon_point)
+    draw_suit('Suit B')
+
+# Artwork for the watermelon card
+def watermelon_artwork():
+    # Middle of the watermelon slice
+    x_watermelon = card_width/3
+    y_watermelon = -card_height/2
+    return [
+        # Card
+        {'path': card_outline_moves, 'pen': 'black', 'fill': 'white', 'at': (0, 0)},
+        # Watermelon skin
+        {'path': [('forward', length*7.5), ('right', angle/2),
+                  ('circle', -(length*7.5), angle), ('right', angle/2),
+                  ('forward', length*7.5)],
+         'pen': 'black', 'fill': 'green',
+         'at': (x_watermelon, y_watermelon), 'heading': (angle/18)*7},
+        # Watermelon fruit(the red part)
+        {'path': [('forward', length*6.5), ('right', angle/2),
+                  ('circle', -(length*6.5), angle), ('right', angle/2),
+                  ('forward', length*6.5)],
+         'pen': 'black', 'fill': 'orange red', 'detail': True},
+        # Watermelon seeds, scattered out from the middle of the slice
+        {'seeds': (x_watermelon, y_watermelon),
+         'headings': (-(length*11), (angle/18)*7), 'distances': ((length*1.5), angle/3),
+         'stretch': ((length/100), (length/40)), 'colour': 'black'}]
 
 # Suit_3 is for strawberry card
 def Suit_3():
-    color("black", "white")
-    pendown()
-    begin_fill()
-    setheading(0)
-    x_strawberry_point = (xcor())
-    y_strawberry_point = (ycor() - (length*6))
-    setheading(0)
-    pendown()
-    # Draw card
-    for draw_card in range(2):
-        forward(card_width)
-        circle(-radius, angle/2)
-        forward(card_height)
-        circle(-radius, angle/2)
-    penup()
-    end_fill()
-    setheading(0)
-    forward(card_width/2.7)
-    right(angle/2)
-    forward(card_height/3.5)
-    setheading(0)
-    x_strawberry = (xcor())
-    y_strawberry = (ycor())
-
-    def strawberry_fruit():
-        # Draw strawberry shape and colour in red
-        pendown()
-        color("black", "crimson")
-        begin_fill()
-        forward(length*4)
-        circle(-(length*2),(angle/18)*11)
-        forward(length*8)
-        circle(-(length*2),(angle/9)*7)
-        forward(length*8)
-        circle(-(length*2),(angle/18)*11)
-        forward(length*4)
-        end_fill()
-        penup()
-
-    def strawberry_stem():
-        # Draw strawberry stem
-        pendown()
-        color("black", "green")
-        begin_fill()
-        left(angle/7)
-        forward(length*3)
-        left((angle/7)*6)
-        forward(length*3)
-        right((angle/18)*11)
-        forward(length*3)
-        left((angle/9)*8)
-        forward(length*3)
-        right((angle/18)*11)
-        forward(length*3)
-        left((angle/9)*8)
-        forward(length*3.36)
-        right((angle/9)*5)
-        forward(length*3)
-        left((angle/9)*8)
-        forward(length*3.36)
-        end_fill()
-        penup()
-
-    def strawberry_seeds():
-        # Draw strawberry seeds
-        color("black")
-        turtlesize((length/50), (length/25))
-        for strawberry_seeds in range(50):
-            goto(x_strawberry, y_strawberry)
-            setheading(0)
-            forward(length*4)
-            circle(-(length*2), (angle/18)*11)
-            forward(length*8)
-            circle(-(length*2), (angle/18)*7)
-            setheading(randint((length*6.5), (angle/18)*11.5))
-            forward(randint(length, (angle/18)*11.2))
-            end_fill()
-            stamp()
-            penup()
-    strawberry_fruit()
-    strawberry_stem()
-    strawberry_seeds()
-    goto(x_strawberry_point, y_strawberry_point)
-    # Draw card number/id and got to start Suit_3 starting point
-    card_identifier()
-    goto(x_strawberry_point, y_strawberry_point)
+    draw_suit('Suit C')
+
+# Artwork for the strawberry card
+def strawberry_artwork():
+    # Top left of the strawberry
+    x_strawberry = card_width/2.7
+    y_strawberry = -card_height/3.5
+    # Tip of the strawberry
+    x_tip, y_tip = path_end(x_strawberry, y_strawberry,
+                            [('forward', length*4), ('circle', -(length*2), (angle/18)*11),
+                             ('forward', length*8), ('circle', -(length*2), (angle/18)*7)])
+    return [
+        # Card
+        {'path': card_outline_moves, 'pen': 'black', 'fill': 'white', 'at': (0, 0)},
+        # Strawberry shape and colour in red
+        {'path': strawberry_fruit_moves, 'pen': 'black', 'fill': 'crimson',
+         'at': (x_strawberry, y_strawberry)},
+        # Strawberry stem
+        {'path': [('left', angle/7), ('forward', length*3),
+                  ('left', (angle/7)*6), ('forward', length*3),
+                  ('right', (angle/18)*11), ('forward', length*3),
+                  ('left', (angle/9)*8), ('forward', length*3),
+                  ('right', (angle/18)*11), ('forward', length*3),
+                  ('left', (angle/9)*8), ('forward', length*3.36),
+                  ('right', (angle/9)*5), ('forward', length*3),
+                  ('left', (angle/9)*8), ('forward', length*3.36)],
+         'pen': 'black', 'fill': 'green', 'detail': True},
+        # Strawberry seeds, scattered out from the tip of the strawberry
+        {'seeds': (x_tip, y_tip),
+         'headings': ((length*6.5), (angle/18)*11.5), 'distances': (length, (angle/18)*11.2),
+         'stretch': ((length/50), (length/25)), 'colour': 'black'}]
 
 # Suit_4 is for avocado card
 def Suit_4():
-    color("black", "white")
-    begin_fill()
-    penup()
-    setheading(0)
-    x_avocado_point = (xcor())
-    y_avocado_point = (ycor() - (length*6))
-    pendown()
-    # Draw card
-    for draw_card in range(2):
-        forward(card_width)
-        circle(-radius, angle/2)
-        forward(card_height)
-        circle(-radius, angle/2)
-    penup()
-    end_fill()
-    setheading(0)
-    forward(card_width/10)
-    right(angle/2)
-    forward(card_height/1.7)
-    setheading(0)
-    x_avocado = (xcor())
-    y_avocado = (ycor())
-
-    def avocado_skin():
-        # Draw avocado skin
-        pendown()
-        color("black", "dark green")
-        begin_fill()
-        left((angle/18)*7.5)
-        circle(-(length*4.8), - (angle/18)*19)
-        forward(-(length*9.6))
-        circle(-(length*2.4), - (angle/18)*15.3)
-        forward(-(length*11.2))
-        end_fill()
-        penup()
-
-    def avocado_fruit():
-        # Draw avocado fruit(inside part)
-        goto(x_avocado, y_avocado)
-        setheading(0)
-        right(angle/18)
-        forward((length/10)*3)
-        left(angle/2)
-        forward((length/10)*2)
-        setheading(0)
-        left((angle/18)*7.5)
-        pendown()
-        color("black", "light green")
-        begin_fill()
-        circle((-(length*5.7))*.8, - ((angle/18)*19))
-        forward((-(length*11.4))*.8)
-        circle((-(length*2.85))*.8, - ((angle/18)*15.3))
-        forward((-(length*13.3))*.8)
-        end_fill()
-        penup()
-
-    def avocado_seed():
-        # Draw avocado seed
-        goto(x_avocado, y_avocado)
-        setheading(0)
-        right(angle/18)
-        forward((angle/18)*7.5)
-        setheading(0)
-        left((angle/18)*7.5)
-        pendown()
-        color("black", "brown")
-        begin_fill()
-        circle((length*2.5), (angle*2))
-        end_fill()
-        penup()
-    avocado_skin()
-    avocado_fruit()
-    avocado_seed()
-    goto(x_avocado_point, y_avocado_point)
-    # Draw card number/id and got to start Suit_4 starting point
-    card_identifier()
-    goto(x_avocado_point, y_avocado_point)
+    draw_suit('Suit D')
+
+# Artwork for the avocado card
+def avocado_artwork():
+    # Bottom of the avocado
+    x_avocado = card_width/10
+    y_avocado = -card_height/1.7
+    return [
+        # Card
+        {'path': card_outline_moves, 'pen': 'black', 'fill': 'white', 'at': (0, 0)},
+        # Avocado skin
+        {'path': avocado_skin_moves, 'pen': 'black', 'fill': 'dark green',
+         'at': (x_avocado, y_avocado), 'heading': (angle/18)*7.5},
+        # Avocado fruit(inside part)
+        {'path': avocado_fruit_moves, 'pen': 'black', 'fill': 'light green',
+         'at': path_end(x_avocado, y_avocado,
+                        [('right', angle/18), ('forward', (length/10)*3),
+                         ('left', angle/2), ('forward', (length/10)*2)]),
+         'heading': (angle/18)*7.5, 'detail': True},
+        # Avocado seed
+        {'path': [('circle', (length*2.5), (angle*2))], 'pen': 'black', 'fill': 'brown',
+         'at': path_end(x_avocado, y_avocado,
+                        [('right', angle/18), ('forward', (angle/18)*7.5)]),
+         'heading': (angle/18)*7.5, 'detail': True}]
+
+register_suit('Suit A', orange_artwork, Suit_1)
+register_suit('Suit B', watermelon_artwork, Suit_2)
+register_suit('Suit C', strawberry_artwork, Suit_3)
+register_suit('Suit D', avocado_artwork, Suit_4)
 
 # Suit_joker is for joker card
 def Suit_joker():
-    color("black", "magenta")
     x_joker = (xcor())
     y_joker = (ycor())
-    pendown()
-    begin_fill()
-    setheading(0)
-    # Draw card
-    for draw_card in range(2):
-        forward(card_width)
-        circle(-radius, angle/2)
-        forward(card_height)
-        circle(-radius, angle/2)
-    penup()
-    end_fill()
-    setheading(0)
-    forward(card_width/3.2)
-    right(angle/2)
-    forward(card_height/3.5)
-    setheading(0)
-
-    def joker_cup():
-        # Draw glass cup
-        pendown()
-        color("black", "white")
-        begin_fill()
-        for draw_card in range(2):
-            forward(length*5)
-            right(angle/2)
-            forward(length*10)
-            right(angle/2)
-        end_fill()
-        penup()
-
-    def joker_drink():
-        # Draw water in cup
-        right(angle/2)
-        forward(length*2)
-        setheading(0)
-        pendown()
-        color("black", "light blue")
-        begin_fill()
-        for cup in range(2):
-            forward(length*5)
-            right(angle/2)
-            forward(length*8)
-            right(angle/2)
-        end_fill()
-        penup()
-
-    def joker_straw():
-        # Draw straw for umbrella
-        color("black")
-        begin_fill()
-        pendown()
-        forward(length*4)
-        left((angle/9)*4)
-        forward(length*5)
-        left((angle/9)*5)
-        forward(length/2)
-        left((angle/9)*4)
-        forward(length*5)
-        penup()
-        end_fill()
-    joker_cup()
-    joker_drink()
-    joker_straw()
+    draw_artwork(joker_artwork)
     # Go to Suit_joker starting point
     goto(x_joker, y_joker)
     # No need to draw card number/id on joker card
 
+# Artwork for the joker card
+def joker_artwork():
+    # Top left of the glass
+    x_joker = card_width/3.2
+    y_joker = -card_height/3.5
+    return [
+        # Card
+        {'path': card_outline_moves, 'pen': 'black', 'fill': 'magenta', 'at': (0, 0)},
+        # Glass cup
+        {'path': [('forward', length*5), ('right', angle/2),
+                  ('forward', length*10), ('right', angle/2)] * 2,
+         'pen': 'black', 'fill': 'white', 'at': (x_joker, y_joker)},
+        # Water in cup
+        {'path': [('forward', length*5), ('right', angle/2),
+                  ('forward', length*8), ('right', angle/2)] * 2,
+         'pen': 'black', 'fill': 'light blue', 'at': (x_joker, y_joker - (length*2)),
+         'detail': True},
+        # Straw for umbrella
+        {'path': [('forward', length*4), ('left', (angle/9)*4),
+                  ('forward', length*5), ('left', (angle/9)*5),
+                  ('forward', length/2), ('left', (angle/9)*4),
+                  ('forward', length*5)],
+         'pen': 'black', 'fill': 'black', 'at': (x_joker, y_joker - (length*2)),
+         'detail': True}]
+
+# Compact deals
+#
+# A game is a list of stack specifications like ['Stack 3', 'Suit D', 4, 4]
+# (stack, suit, number of cards, extra value). A StackDeal holds the same
+# four values as small integers, with the stack and suit as indexes from 0
+# into stack_names and suit_names, checked once when the StackDeal is made.
+# deal_cards turns each stack specification into a StackDeal through
+# normalise_game and then finds the stack's location and the suit's drawing
+# function by index, instead of comparing names card by card.
+#
+# pack_game stores a game in 4 bytes per stack, so large numbers of deals
+# can be kept in memory or written to a file, and unpack_game reads them
+# back.
+
+stack_names = ['Stack ' + str(stack_num+1) for stack_num in range(num_stacks)]
+stack_indices = {name: index for index, name in enumerate(stack_names)}
+deal_size = 4 # bytes per stack in a packed game
+
+class StackDeal:
+    __slots__ = ('stack', 'suit', 'count', 'extra')
+
+    def __init__(self, stack, suit, count, extra):
+        for value in (stack, suit, count, extra):
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise ValueError('stack values must be whole numbers: ' + repr(value))
+        if not 0 <= stack < num_stacks:
+            raise ValueError('stack index out of range: ' + repr(stack))
+        if not 0 <= suit < len(suit_names):
+            raise ValueError('suit index out of range: ' + repr(suit))
+        if not 0 <= count <= max_cards:
+            raise ValueError('number of cards out of range: ' + repr(count))
+        if not 0 <= extra <= count:
+            raise ValueError('extra value out of range: ' + repr(extra))
+        self.stack = stack
+        self.suit = suit
+        self.count = count
+        self.extra = extra
+
+    # Make a StackDeal from a stack specification such as
+    # ['Stack 3', 'Suit D', 4, 4]
+    @classmethod
+    def from_list(cls, spec):
+        stack, suit, count, extra = spec
+        if stack not in stack_indices:
+            raise ValueError('unknown stack: ' + repr(stack))
+        if suit not in suit_indices:
+            raise ValueError('unknown suit: ' + repr(suit))
+        return cls(stack_indices[stack], suit_indices[suit], count, extra)
+
+    # The stack specification again, as random_game would give it
+    def to_list(self):
+        return [stack_names[self.stack], suit_names[self.suit], self.count, self.extra]
+
+    def __eq__(self, other):
+        if not isinstance(other, StackDeal):
+            return NotImplemented
+        return (self.stack, self.suit, self.count, self.extra) == \
+               (other.stack, other.suit, other.count, other.extra)
+
+    def __hash__(self):
+        return hash((self.stack, self.suit, self.count, self.extra))
+
+    def __repr__(self):
+        return 'StackDeal.from_list(' + repr(self.to_list()) + ')'
+
+# Turn a game (StackDeals, stack specification lists, or a packed game)
+# into a list of StackDeals, raising ValueError if any stack is invalid
+def normalise_game(game):
+    if isinstance(game, (bytes, bytearray)):
+        return unpack_game(game)
+    return [deal if isinstance(deal, StackDeal) else StackDeal.from_list(deal)
+            for deal in game]
+
+# Pack a game into deal_size bytes per stack
+def pack_game(game):
+    packed = bytearray()
+    for deal in normalise_game(game):
+        packed += bytes([deal.stack, deal.suit, deal.count, deal.extra])
+    return bytes(packed)
+
+# Read back a game packed by pack_game
+def unpack_game(packed):
+    if len(packed) % deal_size:
+        raise ValueError('packed game length is not a multiple of ' + str(deal_size))
+    return [StackDeal(*packed[start:start + deal_size])
+            for start in range(0, len(packed), deal_size)]
+
+# Render plans
+#
+# plan_deal works out where every card of a game goes, without touching
+# the screen: a flat list of CardPlacements, in drawing order, each giving
+# the card's top left corner, its suit, the card numbers/ids written on it
+# (top left then bottom right), whether it is the joker, its stack and
+# position in the stack, and how much of it is left showing by the cards
+# dealt on top (None for the top card of a stack). draw_plan then draws
+# the placements one by one, and card_identifier leaves the bottom right
+# number/id off a covered card, where it can't be seen.
+# Placements are plain tuples, so plans can be kept, compared and handed
+# to other code (e.g. to draw them some other way) as they are.
+CardPlacement = namedtuple('CardPlacement', ['x', 'y', 'suit', 'labels', 'is_joker',
+                                             'stack', 'number', 'visible_height'])
+
+# Work out the CardPlacements for a game
+def plan_deal(game):
+    plan = []
+    for deal in normalise_game(game):
+        cards = [(suit_names[deal.suit], False)] * deal.count
+        if deal.extra > 1:
+            cards.append((None, True)) # the joker goes on top
+        plan.extend(plan_stack(deal.stack, cards))
+    return plan
+
+# The CardPlacements for one stack of cards, given from the back of the
+# stack as (suit name, is joker) pairs
+def plan_stack(stack, cards):
+    placements = []
+    x_card, y_card = location_start[stack]
+    for number, (suit, is_joker) in enumerate(cards, 1):
+        if cull_hidden_cards and number < len(cards):
+            visible_height = covered_card_height
+        else:
+            visible_height = None
+        # The joker has no card number/id
+        labels = () if is_joker else identifier_labels(y_card - (length*6))
+        placements.append(CardPlacement(x_card, y_card, suit, labels, is_joker,
+                                        stack, number, visible_height))
+        y_card -= length*6
+    return placements
+
+# The tags of a placed card (see Tagged cards)
+def placement_tags(placement):
+    stack_name = stack_names[placement.stack]
+    return ('card', stack_tag(stack_name), card_tag(stack_name, placement.number))
+
+# Draw the cards of a render plan, at the given detail level (by default
+# the one choose_detail_level picks for the plan)
+def draw_plan(plan, detail = None):
+    global card_tags, visible_card_height, card_labels, detail_level
+    detail_level = detail or choose_detail_level(plan)
+    # The turtle only moves between cards here; the artwork is drawn
+    # straight onto the canvas
+    penup()
+    try:
+        for placement in plan:
+            card_tags = placement_tags(placement)
+            visible_card_height = placement.visible_height
+            card_labels = placement.labels
+            if visible_card_height is not None:
+                culled_cards[card_tags[-1]] = (placement, detail_level)
+            goto(placement.x, placement.y)
+            if placement.is_joker:
+                Suit_joker()
+            else:
+                suit_drawers[suit_indices[placement.suit]]()
+    finally:
+        card_tags = ('card',)
+        visible_card_height = None
+        card_labels = None
+        detail_level = 'full'
+
 # Next lines of code are to run game
 def deal_cards(game):
-    for deck in game:
-        # If statements to place cards on correct stack in relation to game function
-        if deck[0] == 'Stack 1':
-            goto(location_start[0])
-        elif deck[0] == 'Stack 2':
-            goto(location_start[1])
-        elif deck[0] == 'Stack 3':
-            goto(location_start[2])
-        elif deck[0] == 'Stack 4':
-            goto(location_start[3])
-        elif deck[0] == 'Stack 5':
-            goto(location_start[4])
-        elif deck[0] == 'Stack 6':
-            goto(location_start[5])
-
-        # Next loop is to place cards(suits,drawings and card numbers/ids) on correct rows and multiply by
-        # number of cards(number_of_cards) represented in game function
-        for fruit in range(deck[2]):
-            if deck[1] == 'Suit A':
-                Suit_1()
-            elif deck[1] == 'Suit B':
-                Suit_2()
-            elif deck[1] == 'Suit C':
-                Suit_3()
-            elif deck[1] == 'Suit D':
-                Suit_4()
-
-        # Next lines are to add 'Joker" card to stacks. So far I have only figured how to add it to the end of stack
-        # not replace an existing card position.
-        for joker_extra in range(deck[3]):
-            if joker_extra == True:
-                Suit_joker()
+    draw_plan(plan_deal(game))
 
+# Deal a new game on the table already set up by create_drawing_canvas.
+# The background (axes, stack markers and border) stays on the canvas and
+# only the cards of the previous deal are cleared, so dealing game after
+# game in one window only costs drawing the cards.
+def new_deal(game):
+    delete_cards('card')
+    deal_cards(game)
 
 
 # Main Program
 #
-# This main program sets up the background
+# This main program sets up the background and deals a random game.
+# It only runs when the program itself is run, so importing it (to use the
+# drawing functions from another program) opens no window.
 #
 
-# Set up the drawing canvas
-# ***** Change the default argument to False if you don't want to
-# ***** display the coordinates and stack locations
-create_drawing_canvas()
-
-# Control the drawing speed
-# ***** Modify the following argument if you want to adjust
-# ***** the drawing speed
-speed('slow')
-
-# Decide whether or not to show the drawing being done step-by-step
-# ***** Set the following argument to False if you don't want to wait
-# ***** while the cursor moves around the screen
-tracer(False)
-
-# Give the drawing canvas a title
-# ***** Replace this title with a description of your cards' theme
-title("Summer Fruits")
-
-### ***** While developing your program you can call the deal_cards
-### ***** function with one of the "fixed" data sets, but your
-### ***** final solution must work with "random_game()" as the
-### ***** argument to the deal_cards function.  Your program must
-### ***** work for any data set that can be returned by the
-### ***** random_game function.
-#deal_cards(fixed_game_0) # <-- used for code development only, not marking
-#deal_cards(full_game) # <-- used for code development only, not marking
-deal_cards(random_game()) # <-- used for assessment
-
-# Exit gracefully
-# ***** Change the default argument to False if you want the
-# ***** cursor (turtle) to remain visible at the end of the
-# ***** program as a debugging aid
-release_drawing_canvas()
+def main():
+    # Set up the drawing canvas
+    # ***** Change the default argument to False if you don't want to
+    # ***** display the coordinates and stack locations
+    create_drawing_canvas()
+
+    # Control the drawing speed
+    # ***** Modify the following argument if you want to adjust
+    # ***** the drawing speed
+    speed('slow')
+
+    # Decide whether or not to show the drawing being done step-by-step
+    # ***** Set the following argument to False if you don't want to wait
+    # ***** while the cursor moves around the screen
+    tracer(False)
+
+    # Give the drawing canvas a title
+    # ***** Replace this title with a description of your cards' theme
+    title("Summer Fruits")
+
+    ### ***** While developing your program you can call the deal_cards
+    ### ***** function with one of the "fixed" data sets, but your
+    ### ***** final solution must work with "random_game()" as the
+    ### ***** argument to the deal_cards function.  Your program must
+    ### ***** work for any data set that can be returned by the
+    ### ***** random_game function.
+    #deal_cards(fixed_game_0) # <-- used for code development only, not marking
+    #deal_cards(full_game) # <-- used for code development only, not marking
+    deal_cards(random_game()) # <-- used for assessment
+
+    # Exit gracefully
+    # ***** Change the default argument to False if you want the
+    # ***** cursor (turtle) to remain visible at the end of the
+    # ***** program as a debugging aid
+    release_drawing_canvas()
+
+
+if __name__ == '__main__':
+    main()
 
 #
 #--------------------------------------------------------------------#
-